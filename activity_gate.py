@@ -0,0 +1,94 @@
+import numpy as np
+from stream_features import StreamingFeatureExtractor, read_block, signal_stats
+
+#Cheap pre-filter that finds the windows of a recording worth classifying. The signal is cut into non-overlapping
+#frames one window step long and two measures are computed for all frames at once:
+#    energy in dB, active if more than thresholdDb above the noise floor (20th percentile of all frames)
+#    spectral flux, the change of the normalized magnitude spectrum from the previous frame, active if more than
+#    fluxRatio times its median
+#Silence fails both tests, steady noise is loud but its spectrum does not change, so only onsets and calls pass. Active
+#frames are padded by padSeconds on both sides and a window is active if any frame it overlaps is. The noise floor is
+#that of the recording itself, so the gate is meant for long field recordings: recordings shorter than minSeconds,
+#such as clips cut around a single call, are not gated at all.
+
+#Settings used when the gate is enabled without giving them
+DEFAULT_GATE = {"label": "Noise", "thresholdDb": 6.0, "fluxRatio": 4.0, "padSeconds": 0.5, "minSeconds": 10.0}
+
+#Frames whose spectrum is computed at once, bounds the memory of the FFT
+FLUX_BLOCK_FRAMES = 4096
+
+#Computes the energy and spectral flux activity of every frame
+#Inputs:  signal: audio samples
+#         frameSamples: samples per frame
+#         thresholdDb: energy above the noise floor in dB that makes a frame active
+#         fluxRatio: spectral flux relative to the median flux that makes a frame active
+#Outputs: active: boolean array with one entry per complete frame
+def frame_activity(signal, frameSamples, thresholdDb, fluxRatio):
+    numFrames = len(signal) // frameSamples
+    if numFrames == 0:
+        return np.zeros(0, dtype=bool)
+    frames = read_block(signal, 0, numFrames * frameSamples).reshape(numFrames, frameSamples)
+    energyDb = 10 * np.log10(np.mean(frames ** 2, 1) + 1e-10)
+    active = energyDb > np.percentile(energyDb, 20) + thresholdDb
+    flux = np.zeros(numFrames)
+    previous = None
+    for start in range(0, numFrames, FLUX_BLOCK_FRAMES):
+        spectrum = np.abs(np.fft.rfft(frames[start:start + FLUX_BLOCK_FRAMES], axis=1))
+        spectrum /= spectrum.sum(1, keepdims=True) + 1e-10
+        #the first frame is compared with itself
+        if previous is None:
+            previous = spectrum[:1]
+        flux[start:start + len(spectrum)] = np.sum(np.diff(np.vstack((previous, spectrum)), axis=0) ** 2, 1)
+        previous = spectrum[-1:]
+    return active | (flux > fluxRatio * np.median(flux))
+
+#Finds the windows of a signal that have to be classified
+#Inputs:  signal: audio samples
+#         Fs: sampling rate of signal
+#         windowSize: size of window in seconds
+#         windowStep: step of window in seconds
+#         gate: settings, see DEFAULT_GATE
+#Outputs: active: boolean array with one entry per window, the windows mid_feature_extraction would compute
+def window_activity(signal, Fs, windowSize, windowStep, gate):
+    window = int(windowSize * Fs)
+    step = int(windowStep * Fs)
+    numWindows = max((len(signal) - window) // step + 1, 0)
+    if len(signal) < gate["minSeconds"] * Fs:
+        return np.ones(numWindows, dtype=bool)
+    frameActive = frame_activity(signal, step, gate["thresholdDb"], gate["fluxRatio"])
+    #window i overlaps frames i .. i + framesPerWindow - 1, widened by the padding on both sides
+    framesPerWindow = -(-window // step)
+    pad = int(round(gate["padSeconds"] / windowStep))
+    counts = np.concatenate(([0], np.cumsum(frameActive)))
+    first = np.clip(np.arange(numWindows) - pad, 0, len(frameActive))
+    last = np.clip(np.arange(numWindows) + framesPerWindow + pad, 0, len(frameActive))
+    return counts[last] > counts[first]
+
+#Splits a boolean array into runs of True
+#Outputs: spans: list of (first, last) index pairs, last exclusive
+def active_spans(active):
+    changes = np.flatnonzero(np.diff(np.concatenate(([0], active.astype(np.int8), [0]))))
+    return list(zip(changes[0::2], changes[1::2]))
+
+#Computes the feature rows of the active windows only. Each span is extracted with a StreamingFeatureExtractor that
+#uses the DC offset and peak amplitude of the whole signal and starts two windows early: the spectral flux of a window
+#depends on the window before it and the delta of the flux on the one before that. The rows are therefore identical
+#to the same rows of mid_feature_extraction on the whole signal.
+#Inputs:  signal: audio samples
+#         Fs: sampling rate of signal
+#         windowSize: size of window in seconds
+#         windowStep: step of window in seconds
+#         active: boolean array returned by window_activity
+#Outputs: F: matrix with one 204 feature row per active window, in window order
+def active_features(signal, Fs, windowSize, windowStep, active):
+    dcOffset, maxAmplitude = signal_stats(signal, max(len(signal), 1))
+    rows = [np.zeros((0, 204))]
+    for first, last in active_spans(active):
+        extractor = StreamingFeatureExtractor(Fs, windowSize, windowStep, dcOffset, maxAmplitude)
+        start = max(first - 2, 0)
+        end = min((last - 1 + extractor.midRatio - 1) * extractor.step + extractor.window, len(signal))
+        F = extractor.push(read_block(signal, start * extractor.step, end))
+        if end == len(signal):
+            F = np.concatenate((F, extractor.finish()))
+        rows.append(F[first - start:first - start + last - first])
+    return np.concatenate(rows)
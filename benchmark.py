@@ -0,0 +1,249 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+from argparse import RawTextHelpFormatter
+from importlib import metadata
+import numpy as np
+from scipy.io import wavfile
+import compute_metrics
+import proj4
+from activity_gate import DEFAULT_GATE
+from classifiers import make_classifier
+
+description = r'''
+This program measures where time goes in the classification pipeline.
+The bundled specificBirds/*.wav clips and synthetic long recordings built from
+them are run through each stage:
+    extract:   proj4.test_features (feature cache disabled)
+    predict:   classifier predict on the feature matrix
+    condense:  interpret_prediction + condense_labels (per window text file)
+    fused:     condense_prediction (condensed labels straight from y_pred)
+    ungated:   the gated path with every window active, i.e. the same decode and
+               streaming extractor without skipping (with --gate)
+    gated:     activity gate, features and prediction of the active windows only
+               (with --gate, its speedup over ungated is the effect of skipping)
+    metrics:   compute_metrics.evaluate on human_labels/ and machine_labels/
+For every stage and input the wall time (best of --repeat runs), windows/s,
+seconds of audio processed per second and peak Python heap memory (measured
+with tracemalloc in one extra run) are recorded and written to a JSON file.
+Give a previous JSON file with --compare to print the speed change per stage.
+'''
+
+#Builds a synthetic recording by alternating low level noise with randomly chosen bird clips, all at one sampling rate
+#Inputs:  clipPaths: paths to the WAV clips to use
+#         minutes: length of the recording in minutes
+#         outputPath: path of the WAV file to write
+#         seed: seed of the random generator, so the same recording is produced on every run
+#Outputs: None
+def make_synthetic_recording(clipPaths, minutes, outputPath, seed=0):
+    clips = {}
+    for clipPath in clipPaths:
+        Fs, signal = wavfile.read(clipPath)
+        clips.setdefault(Fs, []).append(signal.astype(np.float64))
+    #use the most common sampling rate
+    Fs = max(clips, key=lambda rate: len(clips[rate]))
+    clips = clips[Fs]
+    random = np.random.RandomState(seed)
+    numSamples = int(minutes * 60 * Fs)
+    signal = np.zeros(numSamples)
+    position = 0
+    while position < numSamples:
+        position += int(random.uniform(1.0, 5.0) * Fs)
+        clip = clips[random.randint(len(clips))][:max(numSamples - position, 0)]
+        signal[position:position + len(clip)] = clip
+        position += len(clip)
+    signal += random.normal(0, 200, numSamples)
+    wavfile.write(outputPath, Fs, np.clip(signal, -32768, 32767).astype(np.int16))
+
+#Fits a classifier on the bundled clips, each clip being its own class, for runs without a trained model
+#Inputs:  clipPaths: paths to the WAV clips
+#         classifierName: classifier backend, a key of classifiers.CLASSIFIERS
+#Outputs: None, proj4.svclassifier and proj4.classNames are set
+def fit_clip_model(clipPaths, classifierName):
+    matrices = [proj4.test_features(clipPath, 0.25, 0.025) for clipPath in clipPaths]
+    classLabels = np.concatenate([np.full(len(F), i) for i, F in enumerate(matrices)])
+    proj4.svclassifier = make_classifier(classifierName).fit(np.vstack(matrices), classLabels)
+    proj4.classNames = [proj4.audio_name(clipPath) for clipPath in clipPaths]
+
+#set from --no-memory, skips the extra tracemalloc run of every stage
+measureMemory = True
+
+#Runs a stage repeat times and once more under tracemalloc
+#Inputs:  stage: function without arguments
+#         repeat: number of timed runs
+#Outputs: seconds: wall time of the fastest run
+#         peakBytes: peak memory allocated during the stage, None if measureMemory is not set
+#         result: return value of the last run
+def measure(stage, repeat):
+    seconds = float("inf")
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = stage()
+        seconds = min(seconds, time.perf_counter() - start)
+    if not measureMemory:
+        return seconds, None, result
+    tracemalloc.start()
+    stage()
+    peakBytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peakBytes, result
+
+#Builds the result record of one stage
+def record(stageName, inputName, audioSeconds, windows, seconds, peakBytes):
+    return {"stage": stageName, "input": inputName, "audioSeconds": audioSeconds, "windows": windows, \
+            "seconds": seconds, "windowsPerSecond": windows / seconds if windows else None, \
+            "audioSecondsPerSecond": audioSeconds / seconds if audioSeconds else None, "peakBytes": peakBytes}
+
+#Benchmarks extraction, prediction and label writing on one audio file
+#Inputs:  audioFilePath: path to WAV file
+#         workDir: directory for the label files written by the condense stages
+#         repeat: number of timed runs per stage
+#         gate: if given the ungated and gated stages are run with these gate settings
+#Outputs: results: list of stage records
+def benchmark_file(audioFilePath, workDir, repeat, gate=None):
+    inputName = os.path.basename(audioFilePath)
+    Fs, signal = wavfile.read(audioFilePath, mmap=True)
+    audioSeconds = len(signal) / float(Fs)
+    results = []
+
+    seconds, peakBytes, x_test = measure(lambda: proj4.test_features(audioFilePath, 0.25, 0.025), repeat)
+    windows = len(x_test)
+    results.append(record("extract", inputName, audioSeconds, windows, seconds, peakBytes))
+
+    seconds, peakBytes, y_pred = measure(lambda: proj4.svclassifier.predict(x_test), repeat)
+    results.append(record("predict", inputName, audioSeconds, windows, seconds, peakBytes))
+
+    uncompressedPath = os.path.join(workDir, "uc.txt")
+    labelPath = os.path.join(workDir, "labels.txt")
+    def condense():
+        proj4.interpret_prediction(y_pred, uncompressedPath, 0.25, 0.025)
+        proj4.condense_labels(uncompressedPath, labelPath)
+    seconds, peakBytes, result = measure(condense, repeat)
+    results.append(record("condense", inputName, audioSeconds, windows, seconds, peakBytes))
+
+    seconds, peakBytes, result = measure(lambda: proj4.condense_prediction(y_pred, labelPath, 0.25, 0.025), repeat)
+    results.append(record("fused", inputName, audioSeconds, windows, seconds, peakBytes))
+
+    if gate is not None:
+        def gated(gate):
+            x_active, active, seconds = proj4.gated_audio_features(audioFilePath, 0.25, 0.025, gate)
+            if len(x_active) > 0:
+                proj4.svclassifier.predict(x_active)
+            return len(x_active)
+        #recordings shorter than minSeconds are not gated, so this runs the same code with every window active
+        seconds, peakBytes, activeWindows = measure(lambda: gated(dict(gate, minSeconds=float("inf"))), repeat)
+        results.append(record("ungated", inputName, audioSeconds, windows, seconds, peakBytes))
+        seconds, peakBytes, activeWindows = measure(lambda: gated(gate), repeat)
+        results.append(dict(record("gated", inputName, audioSeconds, windows, seconds, peakBytes), \
+                            skippedFraction=1.0 - activeWindows / float(windows) if windows else 0.0))
+    return results
+
+#Prints the fraction of windows the gate skipped and the speedup of the gated stage. The speedup over the ungated stage
+#is that of skipping windows alone, the one over extract + predict also includes the faster streaming extractor.
+def print_gate_results(results):
+    stages = {(result["stage"], result["input"]): result for result in results}
+    for result in results:
+        if result["stage"] != "gated":
+            continue
+        ungated = stages[("ungated", result["input"])]["seconds"]
+        extractPredict = stages[("extract", result["input"])]["seconds"] + \
+                         stages[("predict", result["input"])]["seconds"]
+        print("gate %-26s skipped %5.1f%% of the windows, gated %8.4f s, %.2fx faster than ungated %8.4f s, " \
+              "%.2fx faster than extract + predict %8.4f s" % \
+              (result["input"][:26], 100 * result["skippedFraction"], result["seconds"], ungated / result["seconds"], \
+               ungated, extractPredict / result["seconds"], extractPredict))
+
+#Benchmarks compute_metrics.evaluate on a pair of label directories
+#Outputs: result: stage record, windows is the number of machine label lines scored
+def benchmark_metrics(humanDir, machineDir, repeat):
+    seconds, peakBytes, result = measure(lambda: compute_metrics.evaluate(humanDir, machineDir), repeat)
+    machineLines = 0
+    for labelPath in glob.glob(os.path.join(machineDir, "*.txt")):
+        with open(labelPath) as labelFile:
+            machineLines += sum(1 for line in labelFile)
+    return record("metrics", os.path.basename(os.path.normpath(machineDir)), 0.0, machineLines, seconds, peakBytes)
+
+#Prints the results as a table, with the speed change against a previous run if given
+#Inputs:  results: list of stage records
+#         baseline: list of stage records of a previous run, or None
+def print_results(results, baseline):
+    previous = {}
+    if baseline is not None:
+        previous = {(result["stage"], result["input"]): result for result in baseline}
+    print("%-9s %-26s %10s %12s %12s %10s %9s" % ("stage", "input", "seconds", "windows/s", "audio s/s", "peak MB", \
+                                                 "speedup"))
+    for result in results:
+        speedup = ""
+        if (result["stage"], result["input"]) in previous:
+            speedup = "%.2fx" % (previous[(result["stage"], result["input"])]["seconds"] / result["seconds"])
+        print("%-9s %-26s %10.4f %12s %12s %10s %9s" % \
+              (result["stage"], result["input"][:26], result["seconds"], \
+               "%.0f" % result["windowsPerSecond"] if result["windowsPerSecond"] else "-", \
+               "%.1f" % result["audioSecondsPerSecond"] if result["audioSecondsPerSecond"] else "-", \
+               "%.1f" % (result["peakBytes"] / 2.0**20) if result["peakBytes"] is not None else "-", speedup))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=description, formatter_class=RawTextHelpFormatter)
+    parser.add_argument('--clips', default="specificBirds", \
+                        help="Directory with the short WAV clips (default: specificBirds)")
+    parser.add_argument('--synthetic-minutes', type=float, nargs='*', default=[1.0, 10.0], \
+                        help="Lengths in minutes of the synthetic recordings to generate (default: 1 10)")
+    parser.add_argument('--model-dir', \
+                        help="Model directory to benchmark, by default a model is fit on the clips")
+    parser.add_argument('--classifier', default="linear", \
+                        help="Classifier backend fit on the clips when no model is given (default: linear)")
+    parser.add_argument('--human-labels', default="human_labels", \
+                        help="Human label directory for the metrics stage (default: human_labels)")
+    parser.add_argument('--machine-labels', default="machine_labels", \
+                        help="Machine label directory for the metrics stage (default: machine_labels)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage, the fastest counts (default: 3)")
+    parser.add_argument('-o', '--output', default="benchmark.json", \
+                        help="JSON file the results are written to (default: benchmark.json)")
+    parser.add_argument('--compare', help="JSON file of a previous run to compare against")
+    parser.add_argument('--no-memory', action='store_true', \
+                        help="Skip the extra tracemalloc run per stage that measures peak memory")
+    parser.add_argument('--gate', action='store_true', \
+                        help="Also benchmark classification with the activity gate (proj4.py classify --gate)")
+    args = parser.parse_args()
+
+    measureMemory = not args.no_memory
+
+    clipPaths = sorted(glob.glob(os.path.join(args.clips, "*.wav")))
+    if not clipPaths:
+        parser.error("no .wav files found in " + args.clips)
+    if args.model_dir:
+        proj4.load_model(args.model_dir)
+    else:
+        fit_clip_model(clipPaths, args.classifier)
+
+    workDir = tempfile.mkdtemp(prefix="proj4_benchmark_")
+    try:
+        audioFiles = list(clipPaths)
+        for minutes in args.synthetic_minutes:
+            syntheticPath = os.path.join(workDir, "synthetic_%gmin.wav" % minutes)
+            make_synthetic_recording(clipPaths, minutes, syntheticPath)
+            audioFiles.append(syntheticPath)
+        results = []
+        for audioFilePath in audioFiles:
+            results.extend(benchmark_file(audioFilePath, workDir, args.repeat, DEFAULT_GATE if args.gate else None))
+        results.append(benchmark_metrics(args.human_labels, args.machine_labels, args.repeat))
+    finally:
+        shutil.rmtree(workDir)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as compareFile:
+            baseline = json.load(compareFile)["results"]
+    print_results(results, baseline)
+    print_gate_results(results)
+    with open(args.output, 'w') as outputFile:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(), \
+                   "numpy": np.__version__, "pyAudioAnalysis": metadata.version("pyAudioAnalysis"), \
+                   "platform": platform.platform(), "repeat": args.repeat, "results": results}, outputFile, indent=2)
+    print("Results written to " + args.output)
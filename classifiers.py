@@ -0,0 +1,180 @@
+import json
+import os
+import numpy as np
+
+#scikit-learn is only imported when a classifier is trained, an exported InferenceModel classifies without it
+
+#Linear classifier on standardized features trained with minibatch stochastic gradient descent. Training time grows
+#linearly with the number of windows, unlike libsvm, and training can continue on new data with partial_fit. After
+#training the standardization is folded into the weights, so predicting N windows is a single (N x features) by
+#(features x classes) matrix product followed by an argmax.
+class LinearClassifier:
+
+    #Inputs:  loss: SGDClassifier loss, 'hinge' gives a linear SVM, 'log_loss' logistic regression
+    #         alpha: regularization strength
+    #         epochs: passes over the training data made by fit
+    #         batchSize: windows per minibatch
+    #         randomState: seed for the minibatch order
+    def __init__(self, loss='hinge', alpha=1e-4, epochs=5, batchSize=4096, randomState=0):
+        self.loss = loss
+        self.alpha = alpha
+        self.epochs = epochs
+        self.batchSize = batchSize
+        self.randomState = randomState
+        self.scaler = None
+        self.sgd = None
+
+    #Trains on a full matrix. The scaler is fit in one pass over the data first and then kept fixed while the
+    #minibatches are visited in a new random order each epoch.
+    #Inputs:  X: (windows x features) matrix
+    #         y: class index of every window
+    #Outputs: self
+    def fit(self, X, y):
+        from sklearn.linear_model import SGDClassifier
+        from sklearn.preprocessing import StandardScaler
+        classes = np.unique(y)
+        self.scaler = StandardScaler()
+        for start in range(0, len(X), self.batchSize):
+            self.scaler.partial_fit(X[start:start + self.batchSize])
+        self.sgd = SGDClassifier(loss=self.loss, alpha=self.alpha, random_state=self.randomState)
+        random = np.random.RandomState(self.randomState)
+        for epoch in range(self.epochs):
+            order = random.permutation(len(X))
+            for start in range(0, len(X), self.batchSize):
+                batch = np.sort(order[start:start + self.batchSize])
+                self.sgd.partial_fit(self.scaler.transform(X[batch]), y[batch], classes=classes)
+        self.fold()
+        return self
+
+    #Trains on one more minibatch, e.g. to add windows from new recordings without retraining from scratch. The scaler
+    #is fit on the first minibatch if fit was never called.
+    #Inputs:  X: (windows x features) matrix
+    #         y: class index of every window
+    #         classes: all class indices, required on the first call
+    #Outputs: self
+    def partial_fit(self, X, y, classes=None):
+        from sklearn.linear_model import SGDClassifier
+        from sklearn.preprocessing import StandardScaler
+        if self.scaler is None:
+            self.scaler = StandardScaler().fit(X)
+            self.sgd = SGDClassifier(loss=self.loss, alpha=self.alpha, random_state=self.randomState)
+        self.sgd.partial_fit(self.scaler.transform(X), y, classes=classes)
+        self.fold()
+        return self
+
+    #Folds the standardization into the weights: w.(x - mean)/scale + b = (w/scale).x + (b - (w/scale).mean)
+    def fold(self):
+        coef = self.sgd.coef_ / self.scaler.scale_
+        intercept = self.sgd.intercept_ - coef.dot(self.scaler.mean_)
+        #two classes are stored as a single weight vector for the second class
+        if len(self.sgd.classes_) == 2:
+            coef = np.vstack((-coef, coef))
+            intercept = np.concatenate((-intercept, intercept))
+        self.classes_ = self.sgd.classes_
+        self.coef_ = coef
+        self.intercept_ = intercept
+
+    #Outputs: scores: (windows x classes) matrix of decision values
+    def decision_function(self, X):
+        return np.dot(X, self.coef_.T) + self.intercept_
+
+    #Outputs: class index of every window
+    def predict(self, X):
+        return self.classes_[np.argmax(self.decision_function(X), 1)]
+
+#Creates a libsvm SVC with a linear kernel, the original classifier of proj4.py
+#Inputs:  params: further SVC arguments, e.g. C
+def linear_svc(**params):
+    from sklearn.svm import SVC
+    return SVC(kernel='linear', **params)
+
+#Classifier backends selectable when training, each a function returning an unfitted classifier. Keyword arguments
+#override the default settings of the backend.
+CLASSIFIERS = {
+    "svc": linear_svc,
+    "linear": lambda **params: LinearClassifier(**params),
+    "logistic": lambda **params: LinearClassifier(**dict({"loss": 'log_loss'}, **params)),
+}
+
+#Describes a classifier backend for the model manifest
+CLASSIFIER_DESCRIPTIONS = {
+    "svc": "SVC(kernel='linear')",
+    "linear": "standardized SGDClassifier(loss='hinge')",
+    "logistic": "standardized SGDClassifier(loss='log_loss')",
+}
+
+#Creates an unfitted classifier
+#Inputs:  name: key of CLASSIFIERS
+#         params: settings passed to the backend, e.g. alpha=1e-5 for linear or C=10 for svc
+#Outputs: classifier with fit and predict methods
+def make_classifier(name, **params):
+    return CLASSIFIERS[name](**params)
+
+#Files of an exported inference model, written next to the pickles in a model directory
+INFERENCE_CONFIG = "inference.json"
+INFERENCE_COEF = "inference_coef.npy"
+INFERENCE_INTERCEPT = "inference_intercept.npy"
+
+#Slim classifier used for classification. It holds only the weights of a trained linear classifier, the names of the
+#classes and the window configuration the features were computed with, so classifying does not need the pickled
+#training features, the pickled classifier or scikit-learn. The weights are memory-mapped.
+#  'argmax' models predict the class with the highest decision value (LinearClassifier and two class SVCs)
+#  'ovo' models take a one-vs-one vote over all class pairs the way libsvm does, first class wins ties (multiclass SVC)
+class InferenceModel:
+
+    #Inputs:  modelDir: directory containing the files written by export_inference_model
+    def __init__(self, modelDir):
+        with open(os.path.join(modelDir, INFERENCE_CONFIG)) as configFile:
+            self.config = json.load(configFile)
+        self.classNames = self.config["classNames"]
+        self.classes = np.asarray(self.config["classes"])
+        self.decision = self.config["decision"]
+        self.coef = np.load(os.path.join(modelDir, INFERENCE_COEF), mmap_mode='r')
+        self.intercept = np.load(os.path.join(modelDir, INFERENCE_INTERCEPT), mmap_mode='r')
+        if self.decision == "ovo":
+            #votes gained by the first and the second class of every pair for a positive/non-positive decision value
+            numClasses = len(self.classes)
+            pairs = [(i, j) for i in range(numClasses) for j in range(i + 1, numClasses)]
+            self.firstVotes = np.zeros((len(pairs), numClasses))
+            self.secondVotes = np.zeros((len(pairs), numClasses))
+            for pair, (i, j) in enumerate(pairs):
+                self.firstVotes[pair, i] = 1
+                self.secondVotes[pair, j] = 1
+
+    #Outputs: class index (into classNames) of every window of X
+    def predict(self, X):
+        scores = np.dot(X, self.coef.T) + self.intercept
+        if self.decision == "ovo":
+            positive = scores > 0
+            scores = np.dot(positive, self.firstVotes) + np.dot(~positive, self.secondVotes)
+        return self.classes[np.argmax(scores, 1)]
+
+#Returns True if modelDir contains an exported inference model
+def has_inference_model(modelDir):
+    return os.path.exists(os.path.join(modelDir, INFERENCE_CONFIG))
+
+#Writes the slim inference model of a trained classifier
+#Inputs:  classifier: fitted LinearClassifier or SVC with a linear kernel
+#         classNames: names of the classes, classifier predictions are indices into this list
+#         config: window configuration, e.g. {"windowSize": 0.25, "windowStep": 0.025}
+#         modelDir: directory the files are written to
+#Outputs: None
+def export_inference_model(classifier, classNames, config, modelDir):
+    coef = np.asarray(classifier.coef_, dtype=np.float64)
+    intercept = np.asarray(classifier.intercept_, dtype=np.float64)
+    decision = "argmax"
+    if not isinstance(classifier, LinearClassifier):
+        if getattr(classifier, "kernel", None) != "linear":
+            raise ValueError("only linear classifiers can be exported")
+        if len(classifier.classes_) == 2:
+            #a two class SVC predicts its second class when the single decision value is positive
+            coef = np.vstack((-coef, coef))
+            intercept = np.concatenate((-intercept, intercept))
+        else:
+            decision = "ovo"
+    inferenceConfig = dict(config, classNames=list(classNames), classes=[int(c) for c in classifier.classes_], \
+                           decision=decision, numFeatures=int(coef.shape[1]))
+    np.save(os.path.join(modelDir, INFERENCE_COEF), coef)
+    np.save(os.path.join(modelDir, INFERENCE_INTERCEPT), intercept)
+    with open(os.path.join(modelDir, INFERENCE_CONFIG), 'w') as configFile:
+        json.dump(inferenceConfig, configFile, indent=2)
@@ -0,0 +1,339 @@
+import io
+import json
+import os
+import queue
+import threading
+import time
+import profiling
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from signal import SIGTERM, signal as handle_signal
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+from pyAudioAnalysis import audioBasicIO
+
+#Micro-batching front end for a classifier shared by concurrent requests. Each request submits its feature matrix and
+#waits on a Future. A single thread takes the first waiting matrix, keeps collecting the matrices that arrive within
+#maxDelay seconds (up to maxWindows windows), predicts all of them with one predict call on the stacked matrix and
+#hands every request its slice of the result. Under load this turns many small predict calls into a few large matrix
+#products, when idle a request waits at most maxDelay.
+class BatchPredictor:
+
+    #Inputs:  classifier: fitted classifier or InferenceModel with a predict method
+    #         maxWindows: stop collecting a batch once it holds this many windows
+    #         maxDelay: seconds to wait for more requests after the first one of a batch arrived
+    def __init__(self, classifier, maxWindows=65536, maxDelay=0.005):
+        self.classifier = classifier
+        self.maxWindows = maxWindows
+        self.maxDelay = maxDelay
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.batchRequests = 0
+        self.batchWindows = 0
+        self.maxBatchRequests = 0
+        self.predictSeconds = 0.0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    #Queues a feature matrix for prediction
+    #Inputs:  F: (windows x features) matrix with at least one row
+    #Outputs: future: Future whose result is the predicted class index of every window
+    def submit(self, F):
+        future = Future()
+        self.queue.put((F, future))
+        return future
+
+    #Predicts a feature matrix together with the matrices of other requests, blocks until the result is ready
+    def predict(self, F):
+        return self.submit(F).result()
+
+    #Collects and predicts batches until close is called
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            windows = len(item[0])
+            deadline = time.perf_counter() + self.maxDelay
+            while windows < self.maxWindows:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    #finish this batch first, then stop
+                    self.queue.put(None)
+                    break
+                batch.append(item)
+                windows += len(item[0])
+            self.predict_batch(batch, windows)
+
+    #Predicts one batch with a single predict call and splits the result between its requests
+    def predict_batch(self, batch, windows):
+        start = time.perf_counter()
+        try:
+            y_pred = self.classifier.predict(np.vstack([F for F, future in batch]))
+        except Exception as error:
+            for F, future in batch:
+                future.set_exception(error)
+            return
+        seconds = time.perf_counter() - start
+        offsets = np.cumsum([len(F) for F, future in batch])
+        for (F, future), y in zip(batch, np.split(y_pred, offsets[:-1])):
+            future.set_result(y)
+        with self.lock:
+            self.batches += 1
+            self.batchRequests += len(batch)
+            self.batchWindows += windows
+            self.maxBatchRequests = max(self.maxBatchRequests, len(batch))
+            self.predictSeconds += seconds
+
+    #Stops the batching thread after the queued requests are predicted
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    #Outputs: metrics: dictionary with the queue depth and the number and average size of the batches predicted
+    def metrics(self):
+        with self.lock:
+            return {"queueDepth": self.queue.qsize(), "batches": self.batches, "batchRequests": self.batchRequests, \
+                    "batchWindows": self.batchWindows, "maxBatchRequests": self.maxBatchRequests, \
+                    "meanBatchRequests": self.batchRequests / self.batches if self.batches else None, \
+                    "meanBatchWindows": self.batchWindows / self.batches if self.batches else None, \
+                    "predictSeconds": self.predictSeconds}
+
+#Request counters and latency percentiles of a service, safe to update from several request threads
+class RequestMetrics:
+
+    #Inputs:  window: number of most recent latencies the percentiles are computed over
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.inFlight = 0
+        self.audioSeconds = 0.0
+        self.windows = 0
+        self.latencies = deque(maxlen=window)
+
+    #Marks the start of a request
+    def begin(self):
+        with self.lock:
+            self.inFlight += 1
+
+    #Records a finished request
+    #Inputs:  seconds: latency of the request
+    #         audioSeconds: length of the classified audio, 0 for a failed request
+    #         windows: number of windows classified
+    #         error: True if the request failed
+    def end(self, seconds, audioSeconds=0.0, windows=0, error=False):
+        with self.lock:
+            self.inFlight -= 1
+            self.requests += 1
+            self.errors += int(error)
+            self.audioSeconds += audioSeconds
+            self.windows += windows
+            self.latencies.append(seconds)
+
+    #Outputs: metrics: dictionary with the counters and the mean, median, 95th and 99th percentile latency in seconds
+    def metrics(self):
+        with self.lock:
+            latencies = np.array(self.latencies)
+            metrics = {"uptimeSeconds": time.time() - self.started, "requests": self.requests, \
+                       "errors": self.errors, "inFlight": self.inFlight, "audioSeconds": self.audioSeconds, \
+                       "windows": self.windows}
+        if len(latencies) > 0:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            metrics["latencySeconds"] = {"mean": float(latencies.mean()), "p50": float(p50), "p95": float(p95), \
+                                         "p99": float(p99), "max": float(latencies.max()), "count": len(latencies)}
+        return metrics
+
+#Decodes the raw PCM samples of a service request
+#Inputs:  request: dictionary with "pcm", raw 16 bit little endian samples, their sampling "rate" and the number of
+#         "channels" (1 or 2, interleaved)
+#Outputs: signal: mono signal
+#         Fs: sampling rate
+def pcm_signal(request):
+    channels = request["channels"]
+    if channels not in (1, 2):
+        raise ValueError("channels must be 1 or 2")
+    signal = np.frombuffer(request["pcm"], dtype='<i2')
+    signal = audioBasicIO.stereo_to_mono(signal[:len(signal) // channels * channels].reshape(-1, channels))
+    return signal, request["rate"]
+
+#HTTP handler of the classification service created by make_server. The model configuration, feature function, batch
+#predictor, metrics and feature extraction pool are attributes of the server.
+#    POST /classify  JSON {"path": "/recordings/5E6BA3C8.WAV"}, or raw PCM with ?rate=16000[&channels=1][&name=clip]
+#    GET /metrics    request counts, latency percentiles, queue depth and batch sizes
+#    GET /health     {"status": "ok"}
+class ClassifyRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/metrics":
+            self.send_json(200, {"service": self.server.requestMetrics.metrics(), \
+                                 "batching": self.server.predictor.metrics(), \
+                                 "model": dict(self.server.config, classNames=self.server.classNames)})
+        elif path == "/health":
+            self.send_json(200, {"status": "ok"})
+        else:
+            self.send_json(404, {"error": "unknown path " + path})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/classify":
+            self.send_json(404, {"error": "unknown path " + url.path})
+            return
+        start = time.perf_counter()
+        self.server.requestMetrics.begin()
+        result = None
+        try:
+            #errors reading the request are the client's, anything after that is a failure of the service
+            status = 400
+            request = self.read_request(url)
+            status = 500
+            with profiling.task("serve_request", name=request["name"]):
+                result = self.classify(request)
+            result["seconds"] = time.perf_counter() - start
+        except Exception as error:
+            self.send_json(status, {"error": "%s: %s" % (type(error).__name__, error)})
+            return
+        finally:
+            if result is None:
+                self.server.requestMetrics.end(time.perf_counter() - start, error=True)
+            else:
+                self.server.requestMetrics.end(result["seconds"], result["audioSeconds"], result["windows"])
+        self.send_json(200, result)
+
+    #Builds the request dictionary for the feature function from the body and the query string and checks everything
+    #the client is responsible for: the path must be a readable file, raw PCM must hold at least one window and the
+    #name, which becomes the name of the label file written to the output directory, must not contain a directory.
+    def read_request(self, url):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            request = json.loads(body)
+            if not isinstance(request, dict) or not isinstance(request.get("path"), str):
+                raise ValueError("JSON requests need to be an object with a path")
+            if not os.path.isfile(request["path"]) or not os.access(request["path"], os.R_OK):
+                raise ValueError("cannot read " + request["path"])
+            request.setdefault("name", os.path.splitext(os.path.basename(request["path"]))[0])
+        else:
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            if "rate" not in query:
+                raise ValueError("raw PCM requests need ?rate=")
+            rate = int(query["rate"])
+            if rate <= 0:
+                raise ValueError("rate must be positive")
+            request = {"pcm": body, "rate": rate, "channels": int(query.get("channels", 1)), \
+                       "name": query.get("name", "pcm")}
+            if request["channels"] not in (1, 2):
+                raise ValueError("channels must be 1 or 2")
+            if len(body) < 2 * request["channels"] * int(self.server.config["windowSize"] * rate):
+                raise ValueError("raw PCM is shorter than one window")
+        name = request["name"]
+        if not isinstance(name, str) or name in ("", ".", "..") or "/" in name or "\\" in name or "\0" in name:
+            raise ValueError("name must be a file name without a directory")
+        return request
+
+    #Extracts features, predicts them through the batch predictor and condenses the labels
+    #Outputs: result: dictionary with the name, the audio length, the number of windows, the condensed labels as
+    #         [start, end, class] lists and as label file text, and the seconds spent on features and waiting for
+    #         predict
+    def classify(self, request):
+        windowSize = self.server.config["windowSize"]
+        windowStep = self.server.config["windowStep"]
+        start = time.perf_counter()
+        if self.server.extractPool is not None:
+            with profiling.stage("features"):
+                F, audioSeconds = self.server.extractPool.submit(self.server.requestFeatures, request, windowSize, \
+                                                                 windowStep).result()
+        else:
+            F, audioSeconds = self.server.requestFeatures(request, windowSize, windowStep)
+        featureSeconds = time.perf_counter() - start
+        start = time.perf_counter()
+        labelFile = io.StringIO()
+        condenser = self.server.condenser(labelFile, windowSize, windowStep)
+        if len(F) > 0:
+            with profiling.stage("predict"):
+                y_pred = self.server.predictor.predict(F)
+            condenser.push(y_pred)
+        condenser.finish()
+        predictSeconds = time.perf_counter() - start
+        profiling.count("windows", len(F))
+        profiling.count("labels", condenser.labels)
+        text = labelFile.getvalue()
+        if self.server.outputDir is not None:
+            with open(os.path.join(self.server.outputDir, request["name"] + "_labelled.txt"), 'w') as outputFile:
+                outputFile.write(text)
+        labelList = [[float(startTime), float(endTime), soundType] for startTime, endTime, soundType in \
+                     (line.split("\t") for line in text.splitlines())]
+        return {"name": request["name"], "audioSeconds": audioSeconds, "windows": len(F), "labels": labelList, \
+                "text": text, "featureSeconds": featureSeconds, "predictSeconds": predictSeconds}
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+#Creates the classification service, call serve to run it
+#Inputs:  host, port: address to listen on
+#         classifier: fitted classifier or InferenceModel predicting class indices
+#         classNames: class name of every class index
+#         config: model configuration with the windowSize and windowStep the model was trained with
+#         requestFeatures: function(request, windowSize, windowStep) returning the feature matrix and audio length of
+#         a request, must be picklable if extractPool is given
+#         condenser: class(labelFile, windowSize, windowStep) writing condensed labels with push and finish
+#         batchWindows: largest number of windows predicted in one batch
+#         batchDelay: seconds to wait for more requests before predicting a batch
+#         outputDir: if given the condensed labels of every request are also written to this directory
+#         extractPool: if given features are computed in this executor instead of the request threads
+#Outputs: server: ThreadingHTTPServer
+def make_server(host, port, classifier, classNames, config, requestFeatures, condenser, batchWindows, batchDelay, \
+                outputDir=None, extractPool=None):
+    server = ThreadingHTTPServer((host, port), ClassifyRequestHandler)
+    server.daemon_threads = True
+    server.classNames = classNames
+    server.config = config
+    server.requestFeatures = requestFeatures
+    server.condenser = condenser
+    server.predictor = BatchPredictor(classifier, batchWindows, batchDelay)
+    server.requestMetrics = RequestMetrics()
+    server.outputDir = outputDir
+    if outputDir is not None:
+        os.makedirs(outputDir, exist_ok=True)
+    server.extractPool = extractPool
+    return server
+
+#process running serve, set by serve
+servingPid = None
+
+#SIGTERM handler of the service, ends serve_forever like Ctrl-C. Extraction pool workers inherit the handler and just
+#exit, the serving process shuts them down.
+def stop_serving(signum, frame):
+    if os.getpid() != servingPid:
+        raise SystemExit(1)
+    raise KeyboardInterrupt
+
+#Runs a server created by make_server until Ctrl-C or SIGTERM, then stops the batch predictor and extraction pool
+def serve(server):
+    global servingPid
+    servingPid = os.getpid()
+    handle_signal(SIGTERM, stop_serving)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.predictor.close()
+        if server.extractPool is not None:
+            server.extractPool.shutdown()
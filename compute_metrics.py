@@ -1,7 +1,13 @@
 import os
 import sys
+import csv
+import io
+import json
 import argparse
+import numpy as np
 from argparse import RawTextHelpFormatter
+from multiprocessing import Pool
+import profiling
 
 description = r'''
 This program computes the accuracy of a sound classifier.
@@ -20,156 +26,308 @@ and the label separated by \t or the white space characters. For example:
     67999   90010   car
 A fragment is considered to be well classified (true positive) if
 the detected fragment interval overlaps with the real fragment.
+With --mode duration the labels are compared by time instead: the time line
+is cut at every label boundary and the milliseconds (label times in seconds)
+each human label class is labelled as each machine label class are summed into
+a confusion matrix, from which precision, recall and F1 per class follow.
+File pairs are scored in parallel (-j) and the results can be printed as
+text, JSON or CSV (--format). The same scoring is available from Python:
+    import compute_metrics
+    result = compute_metrics.evaluate("human_labels", "machine_labels")
 *** This program does not check the input files. Giving two directories with 
 files with different names or bad formatted will give unexpected results*** 
 '''
-parser = argparse.ArgumentParser(description=description, formatter_class=RawTextHelpFormatter)
-parser.add_argument('human_directory', metavar='human_labels_directory', \
-                    type=str, help="Directory with the real labels")
-parser.add_argument('machine_directory', metavar='machine_labels_directory', \
-                    type=str, help="Directory with the classifier labels")
-
-args = parser.parse_args()
-human_directory = args.human_directory
-machine_directory = args.machine_directory
-#human_directory = "label"
-#machine_directory = "prediction"
-human_files = []
-machine_files = []
-
-for file in os.listdir(human_directory):
-    if file.endswith(".txt"):
-        human_files.append(file)
-
-for file in os.listdir(machine_directory):
-    if file.endswith(".txt"):
-        machine_files.append(file)
-
-human_files.sort()
-machine_files.sort()
-
-if (human_files != machine_files):
-    print("Incorrect input directories. Files must have the same name")
-    sys.exit()
-
-for i in range(len(human_files)):
-    human_files[i] = os.path.join(human_directory, human_files[i])
-    machine_files[i] = os.path.join(machine_directory, machine_files[i])
-
-classes_stats = {}
-human_times = []
-machine_times = []
-
-bird_tp = 0
-no_bird_tp = 0
-bird_fp = 0
-no_bird_fp = 0
-bird_cnt = 0
-no_bird_cnt = 0
-
-for i in range(len(human_files)):
-    human_times.clear()
-    machine_times.clear()
-    with open(human_files[i]) as fh, open(machine_files[i]) as fm:
-        for line in fh:
-            tokens = line.split()
-            human_times.append([float(tokens[0]), float(tokens[1]), tokens[2].rstrip(), False,False])
-        for line in fm:
+
+#Lists the label file pairs of a human-labeled and a machine-labeled directory
+#Inputs:  human_directory: directory with the real labels
+#         machine_directory: directory with the classifier labels
+#Outputs: pairs: sorted list of (human file, machine file)
+#Raises ValueError if the two directories do not contain the same file names
+def find_file_pairs(human_directory, machine_directory):
+    human_files = sorted(file for file in os.listdir(human_directory) if file.endswith(".txt"))
+    machine_files = sorted(file for file in os.listdir(machine_directory) if file.endswith(".txt"))
+    if (human_files != machine_files):
+        raise ValueError("Incorrect input directories. Files must have the same name")
+    return [(os.path.join(human_directory, file), os.path.join(machine_directory, file)) for file in human_files]
+
+#Reads a label file into arrays
+#Inputs:  filePath: path to label file with one "start end label" line per fragment
+#         classIds: dictionary mapping label names to class ids, new labels are added to it
+#Outputs: starts, ends: float arrays with the fragment times
+#         classes: int array with the class id of every fragment
+def read_labels(filePath, classIds):
+    starts = []
+    ends = []
+    classes = []
+    with profiling.stage("labels_read"), open(filePath) as labelFile:
+        for line in labelFile:
             tokens = line.split()
-            machine_times.append([float(tokens[0]), float(tokens[1]), tokens[2].rstrip(), False,False])
-
-    for k in human_times:
-        if (k[2] not in classes_stats.keys()):
-            classes_stats[k[2]] = {'false_positives': 0, 'true_positives': 0, "count": 0}
-
-    for l in machine_times:
-        if (l[2] not in classes_stats.keys()):
-            classes_stats[l[2]] = {'false_positives': 0, 'true_positives': 0, "count": 0}
-
-    for k in human_times:
-        for l in machine_times:
-            # Checking if two fragments with the same label overlap
-            if (k[0] <= l[1] and k[1] >= l[0]):
-                if k[2] == l[2]:
-                        k[3] = True
-                        l[3] = True
-
-                if k[2][0:4] == 'Bird' and l[2][0:4] == 'Bird':
-                    k[4] = True
-                    l[4] = True
-                if k[2][0:4] != 'Bird' and l[2][0:4] != 'Bird':
-                    k[4] = True
-                    l[4] = True
-            
-
-    # Counting the number of overlapping files and stats
-    for k in human_times:
-        classes_stats[k[2]]["count"] = classes_stats[k[2]]["count"] + 1
-        if (k[2][0:4] == 'Bird'):
-            bird_cnt = bird_cnt +1
-        else:
-            no_bird_cnt = no_bird_cnt +1
-
-        if (k[3] == True):
-            classes_stats[k[2]]["true_positives"] = classes_stats[k[2]]["true_positives"] + 1
-        if (k[4] == True):
-            if (k[2][0:4] == 'Bird'):
-                bird_tp = bird_tp +1
-            else:
-                no_bird_tp = no_bird_tp +1
-
-    for l in machine_times:
-        if (l[3] == False):
-            classes_stats[l[2]]["false_positives"] = classes_stats[l[2]]["false_positives"] + 1
-        if (l[4] == False):
-            if(l[2][0:4] == 'Bird'):
-                bird_fp = bird_fp +1
-            else:
-                no_bird_fp = no_bird_fp +1
-
-total_n = 0
-total_tp = 0
-total_fp = 0
-
-for k in classes_stats:
-    tp = classes_stats[k]["true_positives"]
-    fp = classes_stats[k]["false_positives"]
-    cnt = classes_stats[k]["count"]
-    total_n = total_n + cnt
-    total_tp = total_tp + tp
-    total_fp = total_fp + fp
-    print("Class: " + k)
-    print("    Number of cases: " + str(cnt))
-    print("    True positives: " + str(tp))
-    print("    False positives: " + str(fp))
-    if (cnt != 0):
-        print("    TPR: " + str(float(tp / cnt)))
+            starts.append(float(tokens[0]))
+            ends.append(float(tokens[1]))
+            label = tokens[2].rstrip()
+            if label not in classIds:
+                classIds[label] = len(classIds)
+            classes.append(classIds[label])
+    profiling.count("labels", len(starts))
+    profiling.count("bytesRead", os.path.getsize(filePath))
+    return np.array(starts, dtype=float), np.array(ends, dtype=float), np.array(classes, dtype=int)
+
+#For every fragment of A finds whether a fragment of B with the same key overlaps it. Two fragments overlap if
+#a.start <= b.end and a.end >= b.start. B is sorted by key and start time once; within each key the fragments of B that
+#start before a.end are a prefix of the sorted order, and one of them overlaps a if the largest end in that prefix is
+#at least a.start. A running maximum and a binary search per fragment make this O((A + B) log B) instead of O(A x B).
+#Inputs:  aStarts, aEnds, aKeys: arrays describing the fragments of A
+#         bStarts, bEnds, bKeys: arrays describing the fragments of B
+#Outputs: flags: bool array, True for every fragment of A overlapped by a fragment of B with the same key
+def overlap_flags(aStarts, aEnds, aKeys, bStarts, bEnds, bKeys):
+    flags = np.zeros(len(aStarts), dtype=bool)
+    bOrder = np.lexsort((bStarts, bKeys))
+    bStarts = bStarts[bOrder]
+    bEnds = bEnds[bOrder]
+    bKeys = bKeys[bOrder]
+    aOrder = np.argsort(aKeys, kind='stable')
+    aSortedKeys = aKeys[aOrder]
+    keys, bFirst = np.unique(bKeys, return_index=True)
+    bLast = np.append(bFirst[1:], len(bKeys))
+    for key, first, last in zip(keys, bFirst, bLast):
+        members = aOrder[np.searchsorted(aSortedKeys, key, 'left'):np.searchsorted(aSortedKeys, key, 'right')]
+        if len(members) == 0:
+            continue
+        maxEnds = np.maximum.accumulate(bEnds[first:last])
+        prefix = np.searchsorted(bStarts[first:last], aEnds[members], 'right') - 1
+        found = prefix >= 0
+        flags[members[found]] = maxEnds[prefix[found]] >= aStarts[members[found]]
+    return flags
+
+#Scores one pair of label files
+#Inputs:  pair: (human file, machine file)
+#Outputs: counters: dictionary with per class counts {class: {'count', 'true_positives', 'false_positives'}}, in order
+#         of first appearance with human labels first, and the Bird/No bird counts
+def score_file_pair(pair):
+    with profiling.task("metrics", file=pair[1]):
+        classIds = {}
+        human_starts, human_ends, human_classes = read_labels(pair[0], classIds)
+        machine_starts, machine_ends, machine_classes = read_labels(pair[1], classIds)
+        with profiling.stage("score"):
+            classNames = list(classIds.keys())
+            isBird = np.array([name[0:4] == 'Bird' for name in classNames], dtype=bool)
+
+            # Checking which fragments overlap a fragment with the same label, and with the same Bird/No bird class
+            human_tp = overlap_flags(human_starts, human_ends, human_classes, machine_starts, machine_ends, \
+                                     machine_classes)
+            machine_tp = overlap_flags(machine_starts, machine_ends, machine_classes, human_starts, human_ends, \
+                                       human_classes)
+            human_bird = isBird[human_classes]
+            machine_bird = isBird[machine_classes]
+            human_bird_tp = overlap_flags(human_starts, human_ends, human_bird, machine_starts, machine_ends, \
+                                          machine_bird)
+            machine_bird_tp = overlap_flags(machine_starts, machine_ends, machine_bird, human_starts, human_ends, \
+                                            human_bird)
+
+            # Counting the number of overlapping files and stats
+            counts = np.bincount(human_classes, minlength=len(classNames))
+            true_positives = np.bincount(human_classes[human_tp], minlength=len(classNames))
+            false_positives = np.bincount(machine_classes[~machine_tp], minlength=len(classNames))
+        classes_stats = {}
+        for classId, name in enumerate(classNames):
+            classes_stats[name] = {'false_positives': int(false_positives[classId]), \
+                                   'true_positives': int(true_positives[classId]), "count": int(counts[classId])}
+        return {"classes": classes_stats,
+                "bird_cnt": int(np.sum(human_bird)), "no_bird_cnt": int(np.sum(~human_bird)),
+                "bird_tp": int(np.sum(human_bird_tp & human_bird)),
+                "no_bird_tp": int(np.sum(human_bird_tp & ~human_bird)),
+                "bird_fp": int(np.sum(~machine_bird_tp & machine_bird)),
+                "no_bird_fp": int(np.sum(~machine_bird_tp & ~machine_bird))}
+
+#Adds the counters of several file pairs together, classes keep their order of first appearance
+#Inputs:  allCounters: list of counters returned by score_file_pair, in file order
+#Outputs: counters: merged counters
+def merge_counters(allCounters):
+    merged = {"classes": {}, "bird_cnt": 0, "no_bird_cnt": 0, "bird_tp": 0, "no_bird_tp": 0, "bird_fp": 0, \
+              "no_bird_fp": 0}
+    for counters in allCounters:
+        for name, stats in counters["classes"].items():
+            if name not in merged["classes"]:
+                merged["classes"][name] = {'false_positives': 0, 'true_positives': 0, "count": 0}
+            for key in stats:
+                merged["classes"][name][key] += stats[key]
+        for key in merged:
+            if key != "classes":
+                merged[key] += counters[key]
+    return merged
+
+#Divides two counts, None when the denominator is zero and the rate does not exist
+def rate(numerator, denominator):
+    if denominator == 0:
+        return None
+    return float(numerator / denominator)
+
+#Computes the rates of merged counters
+#Inputs:  counters: counters returned by merge_counters
+#         files: number of file pairs scored
+#Outputs: result: dictionary with per class counts and TPR, overall accuracy and the Bird/No bird statistics. Rates
+#         that do not exist because there are no cases are None.
+def summarize(counters, files):
+    classes = {}
+    for name, stats in counters["classes"].items():
+        classes[name] = dict(stats, tpr=rate(stats["true_positives"], stats["count"]))
+    total_n = sum(stats["count"] for stats in classes.values())
+    total_tp = sum(stats["true_positives"] for stats in classes.values())
+    total_fp = sum(stats["false_positives"] for stats in classes.values())
+    bird_cnt = counters["bird_cnt"]
+    no_bird_cnt = counters["no_bird_cnt"]
+    return {"files": files, "classes": classes,
+            "count": total_n, "true_positives": total_tp, "false_positives": total_fp,
+            "accuracy": rate(total_tp, total_n),
+            "bird": {"count": bird_cnt, "true_positives": counters["bird_tp"],
+                     "false_positives": counters["bird_fp"], "tpr": rate(counters["bird_tp"], bird_cnt)},
+            "no_bird": {"count": no_bird_cnt, "true_negatives": counters["no_bird_tp"],
+                        "false_negatives": counters["no_bird_fp"], "tnr": rate(counters["no_bird_tp"], no_bird_cnt)},
+            "bird_or_no_bird": {"count": bird_cnt + no_bird_cnt,
+                                "correct": counters["bird_tp"] + counters["no_bird_tp"],
+                                "errors": counters["bird_fp"] + counters["no_bird_fp"],
+                                "accuracy": rate(counters["bird_tp"] + counters["no_bird_tp"], \
+                                                 bird_cnt + no_bird_cnt)}}
+
+#Scores a list of label file pairs, in a pool of worker processes if workers > 1
+#Inputs:  pairs: list of (human file, machine file)
+#         workers: number of worker processes
+#Outputs: result: dictionary returned by summarize
+def evaluate_pairs(pairs, workers=1):
+    if workers > 1 and len(pairs) > 1:
+        with Pool(processes=min(workers, len(pairs))) as pool:
+            allCounters = pool.map(score_file_pair, pairs, chunksize=max(1, len(pairs) // (4 * workers)))
     else:
-        print("    TPR: does not exist. There is no fragment with this label in the file. Only false positives")
-    print("")
-
-print("Accuracy: " + str(float(total_tp / total_n)))
-print("Total number of false positives(in absolute terms): " + str(total_fp))
-
-print("\n")
-print("Bird or no bird stats(dividing all classes into two classes: \"Bird\" or \"No Bird\", \"Bird\" is considered to be the positive case\n,  and \"No Bird\" class the negative one):")
-print ("")
-print("Class: Bird")
-print("    Number of cases: "+str(bird_cnt))
-print("    True positives: "+str(bird_tp))
-print("    False positives: "+str(bird_fp))
-print("    TPR: "+str(bird_tp/bird_cnt))
-print("Class: No bird")
-print("    Number of cases: "+str(no_bird_cnt))
-print("    True negatives: "+str(no_bird_tp))
-print("    False negatives: "+str(no_bird_fp))
-print("    TNR: "+str(no_bird_tp/no_bird_cnt))
-print("\n")
-print('Number of cases: '+str(bird_cnt+no_bird_cnt))
-print('Correctly detected fragments: '+str(bird_tp+no_bird_tp))
-print('False positives + False Negatives: '+str(bird_fp+no_bird_fp))
-print('Accuracy: '+str(float((bird_tp+no_bird_tp)/(bird_cnt+no_bird_cnt))))
-print("")
+        allCounters = [score_file_pair(pair) for pair in pairs]
+    return summarize(merge_counters(allCounters), len(pairs))
+
+#Scores every pair of label files of a human-labeled and a machine-labeled directory
+#Inputs:  human_directory: directory with the real labels
+#         machine_directory: directory with the classifier labels
+#         workers: number of worker processes
+#Outputs: result: dictionary returned by summarize
+def evaluate(human_directory, machine_directory, workers=1):
+    return evaluate_pairs(find_file_pairs(human_directory, machine_directory), workers)
+
+#Finds the class active at each time point. Where fragments overlap (condensed machine labels overlap by up to one
+#window) the fragment that started last wins; if it has already ended, the longest running fragment that still covers
+#the point is used. Points not covered by any fragment get class -1.
+#Inputs:  starts, ends, classes: arrays describing the fragments
+#         points: sorted array of time points
+#Outputs: active: int array with the class id at each point
+def active_classes(starts, ends, classes, points):
+    active = np.full(len(points), -1, dtype=int)
+    if len(starts) == 0:
+        return active
+    order = np.argsort(starts, kind='stable')
+    starts = starts[order]
+    ends = ends[order]
+    classes = classes[order]
+    #index of the fragment with the largest end among the first i+1 fragments
+    maxEnds = np.maximum.accumulate(ends)
+    longest = np.maximum.accumulate(np.where(ends == maxEnds, np.arange(len(ends)), 0))
+    last = np.searchsorted(starts, points, 'right') - 1
+    started = last >= 0
+    last = np.maximum(last, 0)
+    covered = started & (ends[last] > points)
+    active[covered] = classes[last[covered]]
+    fallback = started & ~covered & (maxEnds[last] > points)
+    active[fallback] = classes[longest[last[fallback]]]
+    return active
+
+#Measures how long each human label class is labelled as each machine label class in one pair of label files. The
+#time line is cut at every fragment boundary of both files, so within each elementary segment both sides have a single
+#active class, and segment lengths are summed per (human class, machine class) pair with one bincount.
+#Inputs:  pair: (human file, machine file)
+#Outputs: durations: dictionary with classNames and matrix, the milliseconds (label times in seconds) of human class
+#         row labelled as machine class column. Index 0 of both axes is '(none)', time not covered by any label.
+def score_file_durations(pair):
+    with profiling.task("metrics_duration", file=pair[1]):
+        classIds = {}
+        human_starts, human_ends, human_classes = read_labels(pair[0], classIds)
+        machine_starts, machine_ends, machine_classes = read_labels(pair[1], classIds)
+        with profiling.stage("score"):
+            numClasses = len(classIds) + 1
+            boundaries = np.unique(np.concatenate((human_starts, human_ends, machine_starts, machine_ends)))
+            matrix = np.zeros((numClasses, numClasses))
+            if len(boundaries) > 1:
+                midpoints = (boundaries[:-1] + boundaries[1:]) / 2
+                lengths = np.diff(boundaries) * 1000.0
+                human_active = active_classes(human_starts, human_ends, human_classes, midpoints) + 1
+                machine_active = active_classes(machine_starts, machine_ends, machine_classes, midpoints) + 1
+                matrix = np.bincount(human_active * numClasses + machine_active, weights=lengths, \
+                                     minlength=numClasses * numClasses).reshape(numClasses, numClasses)
+            return {"classNames": ["(none)"] + list(classIds.keys()), "matrix": matrix}
+
+#Adds the duration matrices of several file pairs together, classes keep their order of first appearance
+#Inputs:  allDurations: list of durations returned by score_file_durations, in file order
+#Outputs: classNames: names of the merged rows and columns, '(none)' first
+#         matrix: merged confusion matrix in milliseconds
+def merge_durations(allDurations):
+    classNames = ["(none)"]
+    for durations in allDurations:
+        classNames.extend(name for name in durations["classNames"] if name not in classNames)
+    index = {name: i for i, name in enumerate(classNames)}
+    matrix = np.zeros((len(classNames), len(classNames)))
+    for durations in allDurations:
+        positions = np.array([index[name] for name in durations["classNames"]])
+        matrix[np.ix_(positions, positions)] += durations["matrix"]
+    return classNames, matrix
+
+#Computes precision, recall and F1 from a duration confusion matrix
+#Inputs:  classNames: names of the rows and columns, '(none)' first
+#         matrix: confusion matrix in milliseconds, human classes in rows and machine classes in columns
+#         files: number of file pairs scored
+#Outputs: result: dictionary with the matrix and per class human/machine/correct milliseconds, precision, recall and F1
+#         (None where undefined), the overall accuracy over human labelled time and the same for Bird/No bird
+def summarize_durations(classNames, matrix, files):
+    correct = np.diag(matrix)
+    human_ms = matrix.sum(1)
+    machine_ms = matrix.sum(0)
+    classes = {}
+    for i, name in enumerate(classNames):
+        if i == 0:
+            continue
+        precision = rate(correct[i], machine_ms[i])
+        recall = rate(correct[i], human_ms[i])
+        f1 = None
+        if precision is not None and recall is not None and precision + recall > 0:
+            f1 = 2 * precision * recall / (precision + recall)
+        classes[name] = {"human_ms": float(human_ms[i]), "machine_ms": float(machine_ms[i]), \
+                         "correct_ms": float(correct[i]), "precision": precision, "recall": recall, "f1": f1}
+    #collapse classes into (none), Bird, No bird
+    groups = np.array([0] + [1 if name[0:4] == 'Bird' else 2 for name in classNames[1:]])
+    onehot = (groups[:, None] == np.arange(3)).astype(float)
+    binary = onehot.T.dot(matrix).dot(onehot)
+    return {"files": files, "mode": "duration", "classNames": classNames, "matrix_ms": matrix.tolist(),
+            "classes": classes,
+            "accuracy": rate(correct[1:].sum(), human_ms[1:].sum()),
+            "bird_or_no_bird": {"classNames": ["(none)", "Bird", "No bird"], "matrix_ms": binary.tolist(),
+                                "bird_precision": rate(binary[1, 1], binary[:, 1].sum()),
+                                "bird_recall": rate(binary[1, 1], binary[1].sum()),
+                                "accuracy": rate(binary[1, 1] + binary[2, 2], binary[1:].sum())}}
+
+#Scores a list of label file pairs by duration, in a pool of worker processes if workers > 1
+#Inputs:  pairs: list of (human file, machine file)
+#         workers: number of worker processes
+#Outputs: result: dictionary returned by summarize_durations
+def evaluate_durations_pairs(pairs, workers=1):
+    if workers > 1 and len(pairs) > 1:
+        with Pool(processes=min(workers, len(pairs))) as pool:
+            allDurations = pool.map(score_file_durations, pairs, chunksize=max(1, len(pairs) // (4 * workers)))
+    else:
+        allDurations = [score_file_durations(pair) for pair in pairs]
+    classNames, matrix = merge_durations(allDurations)
+    return summarize_durations(classNames, matrix, len(pairs))
+
+#Scores every pair of label files of a human-labeled and a machine-labeled directory by duration
+#Inputs:  human_directory: directory with the real labels
+#         machine_directory: directory with the classifier labels
+#         workers: number of worker processes
+#Outputs: result: dictionary returned by summarize_durations
+def evaluate_durations(human_directory, machine_directory, workers=1):
+    return evaluate_durations_pairs(find_file_pairs(human_directory, machine_directory), workers)
+
 caut_message = '''
 ************************************************************************
 Take into account that the Total number of False Positives number is in absolute value,
@@ -182,5 +340,147 @@ human-labeled fragment could have several machine labeled fragments overlapping
 A better analysis of the false positives will be added to this script if time allows.
 ************************************************************************ 
 '''
-print(caut_message)
-print("")
+
+#Formats a result as the text report
+def format_text(result):
+    lines = []
+    for k, stats in result["classes"].items():
+        lines.append("Class: " + k)
+        lines.append("    Number of cases: " + str(stats["count"]))
+        lines.append("    True positives: " + str(stats["true_positives"]))
+        lines.append("    False positives: " + str(stats["false_positives"]))
+        if (stats["tpr"] is not None):
+            lines.append("    TPR: " + str(stats["tpr"]))
+        else:
+            lines.append("    TPR: does not exist. There is no fragment with this label in the file. Only false positives")
+        lines.append("")
+
+    lines.append("Accuracy: " + format_rate(result["accuracy"]))
+    lines.append("Total number of false positives(in absolute terms): " + str(result["false_positives"]))
+
+    lines.append("\n")
+    lines.append("Bird or no bird stats(dividing all classes into two classes: \"Bird\" or \"No Bird\", \"Bird\" is considered to be the positive case\n,  and \"No Bird\" class the negative one):")
+    lines.append("")
+    lines.append("Class: Bird")
+    lines.append("    Number of cases: "+str(result["bird"]["count"]))
+    lines.append("    True positives: "+str(result["bird"]["true_positives"]))
+    lines.append("    False positives: "+str(result["bird"]["false_positives"]))
+    lines.append("    TPR: "+format_rate(result["bird"]["tpr"]))
+    lines.append("Class: No bird")
+    lines.append("    Number of cases: "+str(result["no_bird"]["count"]))
+    lines.append("    True negatives: "+str(result["no_bird"]["true_negatives"]))
+    lines.append("    False negatives: "+str(result["no_bird"]["false_negatives"]))
+    lines.append("    TNR: "+format_rate(result["no_bird"]["tnr"]))
+    lines.append("\n")
+    lines.append('Number of cases: '+str(result["bird_or_no_bird"]["count"]))
+    lines.append('Correctly detected fragments: '+str(result["bird_or_no_bird"]["correct"]))
+    lines.append('False positives + False Negatives: '+str(result["bird_or_no_bird"]["errors"]))
+    lines.append('Accuracy: '+format_rate(result["bird_or_no_bird"]["accuracy"]))
+    lines.append("")
+    lines.append(caut_message)
+    lines.append("")
+    return "\n".join(lines) + "\n"
+
+#Formats a rate for the text report
+def format_rate(value):
+    if value is None:
+        return "does not exist. There are no cases"
+    return str(value)
+
+#Formats a result as CSV with one row per class and one per Bird/No bird class and total
+def format_csv(result):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["scope", "class", "count", "true_positives", "false_positives", "rate"])
+    for name, stats in result["classes"].items():
+        writer.writerow(["class", name, stats["count"], stats["true_positives"], stats["false_positives"], \
+                         stats["tpr"]])
+    writer.writerow(["total", "", result["count"], result["true_positives"], result["false_positives"], \
+                     result["accuracy"]])
+    writer.writerow(["bird_or_no_bird", "Bird", result["bird"]["count"], result["bird"]["true_positives"], \
+                     result["bird"]["false_positives"], result["bird"]["tpr"]])
+    writer.writerow(["bird_or_no_bird", "No bird", result["no_bird"]["count"], result["no_bird"]["true_negatives"], \
+                     result["no_bird"]["false_negatives"], result["no_bird"]["tnr"]])
+    writer.writerow(["bird_or_no_bird", "", result["bird_or_no_bird"]["count"], result["bird_or_no_bird"]["correct"], \
+                     result["bird_or_no_bird"]["errors"], result["bird_or_no_bird"]["accuracy"]])
+    return output.getvalue()
+
+#Formats a duration result as a text report: per class metrics and the confusion matrix in seconds
+def format_durations_text(result):
+    lines = []
+    for name, stats in result["classes"].items():
+        lines.append("Class: " + name)
+        lines.append("    Human labelled time: %.3f s" % (stats["human_ms"] / 1000))
+        lines.append("    Machine labelled time: %.3f s" % (stats["machine_ms"] / 1000))
+        lines.append("    Correctly labelled time: %.3f s" % (stats["correct_ms"] / 1000))
+        lines.append("    Precision: " + format_rate(stats["precision"]))
+        lines.append("    Recall: " + format_rate(stats["recall"]))
+        lines.append("    F1: " + format_rate(stats["f1"]))
+        lines.append("")
+    lines.append("Accuracy (fraction of human labelled time labelled with the same class): " + \
+                 format_rate(result["accuracy"]))
+    lines.append("Bird or no bird accuracy: " + format_rate(result["bird_or_no_bird"]["accuracy"]))
+    lines.append("Bird precision: " + format_rate(result["bird_or_no_bird"]["bird_precision"]))
+    lines.append("Bird recall: " + format_rate(result["bird_or_no_bird"]["bird_recall"]))
+    lines.append("")
+    lines.append("Confusion matrix in seconds (rows: human labels, columns: machine labels):")
+    classNames = result["classNames"]
+    width = max(10, max(len(name) for name in classNames) + 1)
+    lines.append(" " * width + "".join(name.rjust(width) for name in classNames))
+    for name, row in zip(classNames, result["matrix_ms"]):
+        lines.append(name.ljust(width) + "".join(("%.3f" % (value / 1000)).rjust(width) for value in row))
+    lines.append("")
+    return "\n".join(lines) + "\n"
+
+#Formats a duration result as CSV, one row per (human class, machine class) pair
+def format_durations_csv(result):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["human_class", "machine_class", "milliseconds"])
+    for human, row in zip(result["classNames"], result["matrix_ms"]):
+        for machine, value in zip(result["classNames"], row):
+            writer.writerow([human, machine, value])
+    return output.getvalue()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=description, formatter_class=RawTextHelpFormatter)
+    parser.add_argument('human_directory', metavar='human_labels_directory', \
+                        type=str, help="Directory with the real labels")
+    parser.add_argument('machine_directory', metavar='machine_labels_directory', \
+                        type=str, help="Directory with the classifier labels")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), \
+                        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument('--format', choices=['text', 'json', 'csv'], default='text', \
+                        help="Output format (default: text)")
+    parser.add_argument('-o', '--output', help="File the results are written to (default: standard output)")
+    parser.add_argument('--mode', choices=['fragments', 'duration'], default='fragments', \
+                        help="fragments: count overlapping fragments (default)\n" + \
+                             "duration: confusion matrix of labelled time with precision, recall and F1")
+    parser.add_argument('--profile', metavar='TRACE', \
+                        help="Append stage timings and counters of every file pair as JSON lines to TRACE\n" + \
+                             "(default: $PROJ4_PROFILE, disabled if unset)")
+
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable(args.profile)
+    try:
+        pairs = find_file_pairs(args.human_directory, args.machine_directory)
+    except ValueError as error:
+        print(error)
+        sys.exit()
+
+    if args.mode == 'duration':
+        result = evaluate_durations_pairs(pairs, args.workers)
+    else:
+        result = evaluate_pairs(pairs, args.workers)
+    if args.format == 'json':
+        report = json.dumps(result, indent=2) + "\n"
+    elif args.format == 'csv':
+        report = format_durations_csv(result) if args.mode == 'duration' else format_csv(result)
+    else:
+        report = format_durations_text(result) if args.mode == 'duration' else format_text(result)
+    if args.output:
+        with open(args.output, 'w') as outputFile:
+            outputFile.write(report)
+    else:
+        sys.stdout.write(report)
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+
+#age in seconds after which a temporary file left by an unfinished store is deleted
+STALE_TMP_SECONDS = 600
+
+#Content-addressed on-disk cache for feature matrices. Entries are keyed by a hash of the audio file contents together
+#with the window parameters and feature configuration, so a renamed or copied recording still hits the cache while a
+#change of windowSize/windowStep or of the feature extractor does not. Matrices are stored as .npy files and loaded
+#memory-mapped. When the cache grows past maxBytes the least recently used entries are deleted.
+class FeatureCache:
+
+    #Inputs:  cacheDir: directory the .npy files are stored in, created if missing
+    #         maxBytes: size bound of the cache in bytes
+    def __init__(self, cacheDir, maxBytes):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        #content hashes of the audio files seen so far, by (path, size, modification time)
+        self.digests = {}
+        os.makedirs(cacheDir, exist_ok=True)
+
+    #Computes the cache key of an audio file
+    #Inputs:  audioFilePath: path to audio file
+    #         config: dictionary of everything else the features depend on (window parameters, extractor version)
+    #Outputs: key: hex digest identifying the feature matrix
+    def key(self, audioFilePath, config):
+        digest = hashlib.sha1(self.file_digest(audioFilePath).encode())
+        digest.update(json.dumps(config, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    #Hashes the contents of an audio file. The hash is remembered, so looking up the same unchanged file with several
+    #window configurations reads it only once.
+    #Outputs: digest: hex digest of the file contents
+    def file_digest(self, audioFilePath):
+        stat = os.stat(audioFilePath)
+        fileId = (os.path.abspath(audioFilePath), stat.st_size, stat.st_mtime_ns)
+        if fileId not in self.digests:
+            digest = hashlib.sha1()
+            with open(audioFilePath, 'rb') as audioFile:
+                block = audioFile.read(1 << 20)
+                while block:
+                    digest.update(block)
+                    block = audioFile.read(1 << 20)
+            self.digests[fileId] = digest.hexdigest()
+        return self.digests[fileId]
+
+    def path(self, key):
+        return os.path.join(self.cacheDir, key + ".npy")
+
+    #Loads a cached feature matrix, memory-mapped and read only
+    #Inputs:  key: key returned by FeatureCache.key
+    #Outputs: F: feature matrix, or None if it is not in the cache
+    def load(self, key):
+        path = self.path(key)
+        try:
+            F = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        #mark entry as recently used, best effort so a read-only or shared cache directory still serves hits
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return F
+
+    #Stores a feature matrix and evicts old entries if the cache is over its size bound. The file is written under a
+    #temporary name and renamed so concurrent workers never see a partial entry. If the cache directory is not
+    #writable the matrix is simply not cached.
+    #Inputs:  key: key returned by FeatureCache.key
+    #         F: feature matrix
+    #Outputs: None
+    def store(self, key, F):
+        path = self.path(key)
+        tmpPath = "%s.%d.tmp" % (path, os.getpid())
+        try:
+            with open(tmpPath, 'wb') as npyFile:
+                np.save(npyFile, F)
+            os.replace(tmpPath, path)
+        except OSError:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+            return
+        self.evict()
+
+    #Deletes least recently used entries until the cache is within maxBytes. Temporary files of stores that never
+    #finished, e.g. of a killed worker, are deleted once they are older than STALE_TMP_SECONDS, newer ones count
+    #towards the size bound.
+    def evict(self):
+        entries = []
+        totalBytes = 0
+        now = time.time()
+        for name in os.listdir(self.cacheDir):
+            if not name.endswith((".npy", ".tmp")):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cacheDir, name))
+            except OSError:
+                continue
+            if name.endswith(".tmp"):
+                if now - stat.st_mtime > STALE_TMP_SECONDS:
+                    try:
+                        os.remove(os.path.join(self.cacheDir, name))
+                        continue
+                    except OSError:
+                        pass
+                totalBytes += stat.st_size
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+            totalBytes += stat.st_size
+        entries.sort()
+        for mtime, size, name in entries:
+            if totalBytes <= self.maxBytes:
+                break
+            try:
+                os.remove(os.path.join(self.cacheDir, name))
+            except OSError:
+                continue
+            totalBytes -= size
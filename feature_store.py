@@ -0,0 +1,101 @@
+import numpy as np
+
+#Compact store for training feature vectors. All vectors live in one preallocated float32 matrix that grows by doubling,
+#with an integer label vector holding the class index of every row, so a window costs only its raw feature bytes plus
+#one label. The training matrix and label vector are returned as views of the buffers without copying. Class indices
+#follow the order in which classes were added, like the keys of the feature dictionary this replaces.
+class FeatureStore:
+
+    #Inputs:  capacity: number of rows to preallocate
+    def __init__(self, capacity=4096):
+        self.classNames = []
+        self.classIndex = {}
+        self.capacity = capacity
+        self.size = 0
+        #allocated on the first append, when the number of features is known
+        self.rows = None
+        self.labels = np.zeros(capacity, dtype=np.int32)
+
+    #Builds a store from the old dictionary format, {soundType: [feature vector, ...]}
+    @classmethod
+    def from_dict(cls, featuresDict):
+        store = cls()
+        for soundType, vectors in featuresDict.items():
+            store.add_class(soundType)
+            if len(vectors) > 0:
+                store.append(soundType, np.asarray(vectors))
+        return store
+
+    #Registers a class, does nothing if it is already known
+    #Outputs: index of the class
+    def add_class(self, soundType):
+        if soundType not in self.classIndex:
+            self.classIndex[soundType] = len(self.classNames)
+            self.classNames.append(soundType)
+        return self.classIndex[soundType]
+
+    #Appends feature vectors of one class
+    #Inputs:  soundType: class of the vectors, added if unknown
+    #         vectors: matrix with one feature vector per row
+    #Outputs: None
+    def append(self, soundType, vectors):
+        vectors = np.asarray(vectors)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        if self.rows is None:
+            self.rows = np.zeros((self.capacity, vectors.shape[1]), dtype=np.float32)
+        newSize = self.size + len(vectors)
+        if newSize > self.capacity:
+            self.grow(newSize)
+        self.rows[self.size:newSize] = vectors
+        self.labels[self.size:newSize] = self.add_class(soundType)
+        self.size = newSize
+
+    #Enlarges the buffers to hold at least minCapacity rows, at least doubling them
+    def grow(self, minCapacity):
+        capacity = max(minCapacity, 2 * self.capacity)
+        rows = np.zeros((capacity, self.rows.shape[1]), dtype=np.float32)
+        rows[:self.size] = self.rows[:self.size]
+        labels = np.zeros(capacity, dtype=np.int32)
+        labels[:self.size] = self.labels[:self.size]
+        self.rows = rows
+        self.labels = labels
+        self.capacity = capacity
+
+    #Outputs: matrix: (rows x features) float32 view of all stored vectors
+    #         classLabels: class index of every row
+    def training_matrix(self):
+        if self.rows is None:
+            return np.zeros((0, 0), dtype=np.float32), self.labels[:0]
+        return self.rows[:self.size], self.labels[:self.size]
+
+    #Returns the feature vectors of one class
+    def class_rows(self, soundType):
+        matrix, classLabels = self.training_matrix()
+        return matrix[classLabels == self.classIndex[soundType]]
+
+    #Class names in index order, so list(store.keys()) works like it did for the feature dictionary
+    def keys(self):
+        return list(self.classNames)
+
+    def __contains__(self, soundType):
+        return soundType in self.classIndex
+
+    def __len__(self):
+        return self.size
+
+    #Only the used part of the buffers is pickled
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        matrix, classLabels = self.training_matrix()
+        state["rows"] = None if self.rows is None else matrix.copy()
+        state["labels"] = classLabels.copy()
+        state["capacity"] = self.size
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.capacity == 0:
+            self.capacity = 1
+            self.rows = None
+            self.labels = np.zeros(1, dtype=np.int32)
@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from argparse import RawTextHelpFormatter
+from collections import defaultdict
+from contextlib import nullcontext
+
+description = r'''
+This program aggregates the profiling traces written by proj4.py and
+compute_metrics.py. Profiling is enabled with --profile TRACE or the
+PROJ4_PROFILE=TRACE environment variable. Every classified file, training
+file, model fit and scored label file pair is then appended to TRACE as one
+JSON line holding the run id, the wall time spent in each stage (decode,
+features, label_assignment, predict, labels_read, labels_write, ...) and
+counters (windows, labels, bytesRead). Traces of many runs and worker
+processes can be appended to the same file and summarized together:
+    python3 profiling.py trace.jsonl [more.jsonl ...] [--by-run]
+'''
+
+#Lightweight stage timers and counters. Work is grouped in tasks, e.g. the classification of one file; inside a task
+#stage() times a block of code and count() adds to a counter, and when the task ends a single JSON line is appended to
+#the trace file. Tasks are tracked per thread, so the request threads of the service each have their own. When
+#profiling is disabled task() and stage() return a shared no-op context manager and count() returns immediately, so
+#the hooks can stay in the code.
+
+#path of the JSON lines trace, None while profiling is disabled
+tracePath = None
+#identifies the process tree of one command, shared with worker processes through the environment
+runId = None
+#task of the current thread
+local = threading.local()
+writeLock = threading.Lock()
+NULL_CONTEXT = nullcontext()
+
+#Enables profiling
+#Inputs:  path: trace file the task records are appended to
+#         run: run id written with every record, generated if not given
+#Outputs: None
+def enable(path, run=None):
+    global tracePath, runId
+    tracePath = path
+    runId = run or os.environ.get("PROJ4_PROFILE_RUN") or \
+            "%s-%s" % (time.strftime("%Y%m%d-%H%M%S"), uuid.uuid4().hex[:6])
+    #worker processes started with spawn enable themselves on import
+    os.environ["PROJ4_PROFILE"] = path
+    os.environ["PROJ4_PROFILE_RUN"] = runId
+
+#Times a task and writes its record when it ends
+class Task:
+
+    #Inputs:  name: kind of work, e.g. "classify"
+    #         fields: values identifying the task written with the record, e.g. file=path
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.stages = defaultdict(float)
+        self.counters = defaultdict(int)
+
+    def __enter__(self):
+        self.parent = getattr(local, "task", None)
+        local.task = self
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        seconds = time.perf_counter() - self.start
+        local.task = self.parent
+        entry = dict(self.fields, time=time.time(), run=runId, host=socket.gethostname(), pid=os.getpid(), \
+                     task=self.name, seconds=seconds, stages=dict(self.stages), counters=dict(self.counters))
+        if excType is not None:
+            entry["error"] = excType.__name__
+        write(entry)
+        return False
+
+#Adds the time of a block of code to a stage of the current task
+class Stage:
+
+    def __init__(self, task, name):
+        self.task = task
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.task.stages[self.name] += time.perf_counter() - self.start
+        return False
+
+#Starts a task, use as "with profiling.task('classify', file=path):"
+def task(taskName, **fields):
+    if tracePath is None:
+        return NULL_CONTEXT
+    return Task(taskName, fields)
+
+#Times a stage of the current task, use as "with profiling.stage('decode'):". Stages outside of a task are not recorded.
+def stage(name):
+    if tracePath is None:
+        return NULL_CONTEXT
+    current = getattr(local, "task", None)
+    if current is None:
+        return NULL_CONTEXT
+    return Stage(current, name)
+
+#Adds n to a counter of the current task
+def count(name, n=1):
+    if tracePath is None:
+        return
+    current = getattr(local, "task", None)
+    if current is not None:
+        current.counters[name] += int(n)
+
+#Appends one record to the trace. Each record is written with a single call on a file opened for appending, so records
+#of concurrent threads and processes do not interleave.
+def write(entry):
+    line = json.dumps(entry) + "\n"
+    with writeLock:
+        with open(tracePath, 'a') as traceFile:
+            traceFile.write(line)
+
+#Reads the records of one or more trace files
+#Outputs: entries: list of record dictionaries, in file order
+def read_traces(paths):
+    entries = []
+    for path in paths:
+        with open(path) as traceFile:
+            for line in traceFile:
+                if line.strip():
+                    entries.append(json.loads(line))
+    return entries
+
+#Sums the records per task name, or per (run, task name) if byRun is set
+#Outputs: summary: dictionary mapping each group to its number of records, errors, total seconds and the summed
+#         seconds of every stage and value of every counter
+def aggregate(entries, byRun=False):
+    summary = {}
+    for entry in entries:
+        group = (entry["run"], entry["task"]) if byRun else entry["task"]
+        if group not in summary:
+            summary[group] = {"tasks": 0, "errors": 0, "seconds": 0.0, "stages": defaultdict(float), \
+                              "counters": defaultdict(int), "runs": set()}
+        totals = summary[group]
+        totals["tasks"] += 1
+        totals["errors"] += int("error" in entry)
+        totals["seconds"] += entry["seconds"]
+        totals["runs"].add(entry["run"])
+        for name, seconds in entry["stages"].items():
+            totals["stages"][name] += seconds
+        for name, value in entry["counters"].items():
+            totals["counters"][name] += value
+    return summary
+
+#Prints the aggregated stages and counters of every group
+def print_summary(summary):
+    for group, totals in sorted(summary.items(), key=lambda item: str(item[0])):
+        name = "/".join(group) if isinstance(group, tuple) else group
+        print("%s: %d tasks in %d runs, %.3f s total, %.1f ms mean%s" % \
+              (name, totals["tasks"], len(totals["runs"]), totals["seconds"], \
+               1000 * totals["seconds"] / totals["tasks"], \
+               ", %d failed" % totals["errors"] if totals["errors"] else ""))
+        stageSeconds = sum(totals["stages"].values())
+        for stageName, seconds in sorted(totals["stages"].items(), key=lambda item: -item[1]):
+            print("    %-18s %10.3f s %6.1f%%" % (stageName, seconds, 100 * seconds / max(totals["seconds"], 1e-12)))
+        if totals["seconds"] > stageSeconds:
+            print("    %-18s %10.3f s %6.1f%%" % ("(other)", totals["seconds"] - stageSeconds, \
+                                                 100 * (totals["seconds"] - stageSeconds) / totals["seconds"]))
+        for counterName, value in sorted(totals["counters"].items()):
+            print("    %-18s %12d  %12.1f/s" % (counterName, value, value / max(totals["seconds"], 1e-12)))
+
+#Profiling is enabled for any process started with PROJ4_PROFILE set, including worker processes
+if os.environ.get("PROJ4_PROFILE"):
+    enable(os.environ["PROJ4_PROFILE"])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=description, formatter_class=RawTextHelpFormatter)
+    parser.add_argument('traces', metavar='trace', nargs='+', help="JSON lines trace files")
+    parser.add_argument('--by-run', action='store_true', help="Summarize every run separately")
+    parser.add_argument('--format', choices=['text', 'json'], default='text', help="Output format (default: text)")
+    args = parser.parse_args()
+
+    summary = aggregate(read_traces(args.traces), args.by_run)
+    if args.format == 'json':
+        print(json.dumps([dict(totals, group=group, runs=sorted(totals["runs"])) \
+                          for group, totals in summary.items()], indent=2))
+    else:
+        print_summary(summary)
@@ -2,33 +2,82 @@ from pyAudioAnalysis import audioBasicIO
 from pyAudioAnalysis import MidTermFeatures
 import numpy as np
 import pickle
+import profiling
 import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+from multiprocessing import Pool
 from argparse import RawTextHelpFormatter
-from sklearn.svm import SVC
+from scipy.io import wavfile
+from classifiers import CLASSIFIERS, CLASSIFIER_DESCRIPTIONS, InferenceModel, export_inference_model, \
+    has_inference_model, make_classifier
+from classify_service import make_server, pcm_signal, serve
+from activity_gate import DEFAULT_GATE, active_features, window_activity
+from feature_cache import FeatureCache
+from feature_store import FeatureStore
+from stream_features import StreamingFeatureExtractor, open_signal, read_block, signal_stats
 
 description = r'''
-This program classifies an audio file using a SVM.
+This program classifies audio files using a SVM.
+    python3 proj4.py [classify] audioFilePath ...
+        Classifies audio files. Each input may be a single audio file, a
+        directory (every .wav file in it is classified) or a glob pattern such
+        as "recordings/*.WAV". The model is loaded once and the files are
+        spread across a pool of worker processes.
+    python3 proj4.py train --audio-dir DIR
+        Trains the SVM on the Audacity label files in label_files/<site>/ and
+        the matching audio files found under DIR, and writes a new versioned
+        model directory.
+    python3 proj4.py export --model-dir DIR
+        Writes the slim inference model for a model directory that only has
+        learned_features.pkl and trained_SVM.pkl.
+    python3 proj4.py serve [--port 8765]
+        Keeps the model loaded and classifies audio files or raw PCM sent
+        over HTTP, predicting concurrent requests together in batches.
 '''
 
-#dictionary to store labels and features
+#dictionary to store labels and compact store of the training features of each sound type
 labels = {}
-features = {}
+features = FeatureStore()
 
-#load features
-pkl_file = open('learned_features.pkl', 'rb')
-features = pickle.load(pkl_file)
-pkl_file.close()
+#trained SVM machine and the class names its integer predictions map to
+svclassifier = None
+classNames = []
 
-#load trained SVM machine
-pkl_file = open('trained_SVM.pkl', 'rb')
-svclassifier = pickle.load(pkl_file)
-pkl_file.close()
+#on-disk feature cache shared by training and classification, None when caching is disabled. Set from --cache-dir
+#(default $PROJ4_FEATURE_CACHE) when run as a script, scripts importing this module set it themselves.
+featureCache = None
+
+#Loads the trained classifier and its class names into the module globals. If modelDir contains an exported inference
+#model (see export_inference_model) only its weights are loaded, memory-mapped. Otherwise the pickled features and SVM
+#are unpickled, which also loads every training feature vector just to recover the class names.
+#Inputs:  modelDir: directory with inference.json or with learned_features.pkl and trained_SVM.pkl
+#Outputs: config: dictionary with the windowSize and windowStep the model was trained with
+def load_model(modelDir='.'):
+    global features, svclassifier, classNames
+    if has_inference_model(modelDir):
+        svclassifier = InferenceModel(modelDir)
+        classNames = svclassifier.classNames
+        return {"windowSize": svclassifier.config["windowSize"], "windowStep": svclassifier.config["windowStep"]}
+    #load features
+    with open(os.path.join(modelDir, 'learned_features.pkl'), 'rb') as pkl_file:
+        features = pickle.load(pkl_file)
+    classNames = list(features.keys())
+    #load trained SVM machine
+    with open(os.path.join(modelDir, 'trained_SVM.pkl'), 'rb') as pkl_file:
+        svclassifier = pickle.load(pkl_file)
+    return {"windowSize": 0.25, "windowStep": 0.025}
 
 #Process Audacity generated labelled file assumes files are names in format 5E6BA3C8_labelled.txt
 #Inputs : filePath, the path name to the audacity label file
 #Outputs: None
 def process_label(filePath):
-    audioName = filePath[-21:]
+    audioName = os.path.basename(filePath)
     audioName = audioName.split("_")[0]
     labels.update({audioName:{}})
     with open(filePath, "r") as labelFile:
@@ -46,78 +95,84 @@ def process_label(filePath):
                 thisAudio[soundType].append([startTime,endTime])
             else:
                 thisAudio.update({soundType:[[startTime,endTime]]})
-            #add sound type to feature dictionary
-            if soundType not in features:
-                features.update({soundType:[]})
+            #add sound type to feature store
+            features.add_class(soundType)
+            profiling.count("labels")
             #read next line for processing
             label = labelFile.readline()
+    profiling.count("bytesRead", os.path.getsize(filePath))
 
-#Cross-references a specific time window with the audioLabels to find intersection, returns which soundTypes intersect
-#with this window
-#Inputs: window, window[0] is the start time of the window and window[1] is the end time
-#Outputs intersections, array of strings representing sound types that correspond to audio window
-def sound_type_lookup(window, audioLabels):
-    soundTypes = audioLabels.keys()
-    intersections = []
-    for soundType in soundTypes:
-        times = audioLabels[soundType]
-        for time in times:
-            startTime = time[0]
-            endTime = time[1]
-            #check for intersection
-            if window[0] < endTime and window[1] > startTime:
-                intersections.append(soundType)
-    return intersections
+#Cross-references every window of an audio file with the audioLabels at once to find which soundTypes intersect each
+#window. Window i covers [i*windowStep, i*windowStep + windowSize), computed from its index so no rounding error
+#accumulates. For every label interval the range of overlapping windows is found with a binary search over the window
+#start and end times, so the cost is O((windows + labels) log windows) instead of a scan of all labels per window.
+#Inputs:  audioLabels: dictionary mapping each soundType to its list of [startTime, endTime] intervals
+#         numWindows: number of windows in the audio file
+#         windowSize: specifies size of window in seconds
+#         windowStep: specifies size of step in seconds
+#Outputs: windowIndices: dictionary mapping each soundType to the sorted array of the windows that intersect it. A
+#         window overlapping several intervals of the same soundType is listed once per interval.
+def window_label_indices(audioLabels, numWindows, windowSize, windowStep):
+    windowStarts = np.arange(numWindows) * windowStep
+    windowEnds = windowStarts + windowSize
+    windowIndices = {}
+    for soundType, times in audioLabels.items():
+        times = np.asarray(times, dtype=float).reshape(-1, 2)
+        #first window ending after the interval starts, first window starting at or after the interval ends
+        first = np.searchsorted(windowEnds, times[:,0], side='right')
+        last = np.searchsorted(windowStarts, times[:,1], side='left')
+        counts = np.maximum(last - first, 0)
+        #concatenate the ranges first[j]..last[j]-1 of all intervals
+        offsets = np.repeat(first - np.cumsum(counts) + counts, counts)
+        windowIndices[soundType] = np.sort(np.arange(np.sum(counts)) + offsets)
+    return windowIndices
 
 #Computes feature sets for audio file. 34 features are computed they include: Zero Crossing Rate, Energy, Entropy of
 #Energy, Spectral Centroid, Spectral Spread, Spectral Entropy, Spectral Flux, Spectral Rolloff, MFCCs (9-21), Chroma
 #vector (22-33), and Chroma Deviation. In addition the deltas (difference between current and last feature vector) are
 #computed. These are the short term features (64 in total), the mid term features are the mean and variance statistics
 #of the short term features. Together they form 204 total features (64 short term, 64 mean, 64 variance)
-#These features are compiled into matrix of dimension 204xN where N is the number windows that fit in audio file.
-#Then each column of features is assigned to a specific sound type and placed in global feature dictionary.
+#These features are compiled into matrix of dimension Nx204 where N is the number windows that fit in audio file.
+#Then each row of features is assigned to a specific sound type and placed in global feature store.
 #Inputs: labelsDict: dictionary of labels
 #        audioFilePath: path to audio file
 #        windowSize: specifies size of window in seconds
 #        windowStep: specifies size of step in seconds
 #Outputs: None
 def process_learning_features(labelsDict, audioFilePath, windowSize, windowStep):
-    audioName = audioFilePath[-12:]
-    audioName = audioName.split(".")[0]
-    [Fs, signal] = audioBasicIO.read_audio_file(audioFilePath)
-    mF, sF, f_names = MidTermFeatures.mid_feature_extraction(signal, Fs, windowSize * Fs, windowStep * Fs, \
-                                                             windowSize * Fs, windowStep * Fs)
-    #Window that corresponds to a single column in feature array F
-    timeWindow = [0.0,windowSize]
     #look at labels for this audio file
-    thisAudio = labelsDict[audioName]
-    count = 0
-    while count < np.size(mF,1):
-        intersections = sound_type_lookup(timeWindow, thisAudio)
-        for inter in intersections:
-            features[inter].append(np.concatenate((sF[:,count], mF[:,count])))
-        count += 1
-        timeWindow[0] += windowStep
-        timeWindow[1] += windowStep
-
-#This function converts a dictionary of features into a matrix to be used for training the SVM machine
-#Inputs: featuresDict: Dictionary of features where the keys are the name of the audio file processed and the values are
+    thisAudio = labelsDict[audio_name(audioFilePath)]
+    classRows, audioSeconds = label_features(thisAudio, audioFilePath, windowSize, windowStep)
+    for soundType, rows in classRows:
+        features.append(soundType, rows)
+
+#Computes the features of an audio file and gathers the rows of each sound type in its labels
+#Inputs:  audioLabels: dictionary mapping each soundType to its list of [startTime, endTime] intervals
+#         audioFilePath: path to audio file
+#         windowSize: specifies size of window in seconds
+#         windowStep: specifies size of step in seconds
+#Outputs: classRows: list of (soundType, float32 matrix of the feature rows of the windows intersecting it)
+#         audioSeconds: length of the audio file in seconds
+def label_features(audioLabels, audioFilePath, windowSize, windowStep):
+    F, audioSeconds = audio_features(audioFilePath, windowSize, windowStep)
+    with profiling.stage("label_assignment"):
+        windowIndices = window_label_indices(audioLabels, np.size(F,0), windowSize, windowStep)
+        classRows = [(soundType, np.asarray(F[indices], dtype=np.float32)) \
+                     for soundType, indices in windowIndices.items()]
+    profiling.count("windows", len(F))
+    profiling.count("labels", sum(len(times) for times in audioLabels.values()))
+    return classRows, audioSeconds
+
+#This function converts the stored features into a matrix to be used for training the SVM machine. The matrix and
+#labels are views of the feature store buffers, no copy is made.
+#Inputs: featuresDict: FeatureStore, or a dictionary of features where the keys are the sound types and the values are
+#        lists of feature vectors (the format of older learned_features.pkl files)
+#Outputs: matrix: (windows x features) float32 matrix
+#         classLabels: class index of every row of matrix, in the order of featuresDict.keys()
 def dict_to_training_matrix(featuresDict):
-    classes = features.keys()
-    count = 0
-    matrix = np.ndarray((0,204))
-    classLabels = []
-    for cl in classes:
-        thisClass = features[cl]
-        numRows = np.size(thisClass,0)
-        numCols = np.size(thisClass,1)
-        ftMatrix = np.zeros((numRows,numCols))
-        for i in range(0,numRows):
-            ftMatrix[i,0:numCols] = thisClass[i]
-            classLabels.append(count)
-        matrix = np.concatenate((matrix,ftMatrix))
-        count += 1
-    return matrix, np.transpose(np.asarray(classLabels))
+    if isinstance(featuresDict, dict):
+        featuresDict = FeatureStore.from_dict(featuresDict)
+    return featuresDict.training_matrix()
 
 #Computes feature set for audio file to be classified
 #Inputs:  audioPath: Path to audio file to be classified
@@ -125,7 +180,76 @@ def dict_to_training_matrix(featuresDict):
 #         windowStep: Step size of window, overlaps if less than windowSize
 #Outputs: F: Matrix of features for audio file
 def test_features(audioPath, windowSize, windowStep):
-    [Fs, signal] = audioBasicIO.read_audio_file(audioPath)
+    F, audioSeconds = audio_features(audioPath, windowSize, windowStep)
+    return F
+
+#Returns the feature matrix of an audio file. When the feature cache is enabled the matrix is loaded memory-mapped from
+#the cache if this file was processed with the same window parameters before, otherwise it is computed and stored.
+#Inputs:  audioFilePath: path to audio file
+#         windowSize: Size of window in seconds to compute features for
+#         windowStep: Step size of window, overlaps if less than windowSize
+#Outputs: F: Nx204 matrix of features, one row per window
+#         audioSeconds: length of the audio file in seconds
+def audio_features(audioFilePath, windowSize, windowStep):
+    if featureCache is not None:
+        with profiling.stage("cache_load"):
+            key = featureCache.key(audioFilePath, feature_config(windowSize, windowStep))
+            F = featureCache.load(key)
+        if F is not None:
+            profiling.count("cacheHits")
+            return F, audio_duration(audioFilePath, F, windowSize, windowStep)
+    with profiling.stage("decode"):
+        [Fs, signal] = audioBasicIO.read_audio_file(audioFilePath)
+    profiling.count("bytesRead", os.path.getsize(audioFilePath))
+    with profiling.stage("features"):
+        F = signal_features(signal, Fs, windowSize, windowStep)
+    if featureCache is not None:
+        with profiling.stage("cache_store"):
+            featureCache.store(key, F)
+    return F, len(signal) / float(Fs)
+
+#Everything besides the audio contents that the feature matrix depends on, used to key the feature cache
+def feature_config(windowSize, windowStep):
+    return {"windowSize": windowSize, "windowStep": windowStep, "extractor": "mid_feature_extraction", \
+            "pyAudioAnalysis": metadata.version("pyAudioAnalysis")}
+
+#Length of an audio file in seconds without decoding it. Only the WAV header is read, for other formats the length is
+#estimated from the number of windows in its feature matrix F.
+def audio_duration(audioFilePath, F, windowSize, windowStep):
+    try:
+        Fs, signal = wavfile.read(audioFilePath, mmap=True)
+        return len(signal) / float(Fs)
+    except (ValueError, OSError):
+        return (len(F) - 1) * windowStep + windowSize
+
+#Computes the features of the windows of an audio file that pass the activity gate. The feature cache is not used, the
+#point of the gate is to skip extracting the inactive windows.
+#Inputs:  audioFilePath: path to audio file
+#         windowSize: Size of window in seconds to compute features for
+#         windowStep: Step size of window, overlaps if less than windowSize
+#         gate: gate settings, see activity_gate.DEFAULT_GATE
+#Outputs: F: Matrix of features of the active windows, one row per window
+#         active: boolean array marking the active windows among all windows of the file
+#         audioSeconds: length of the audio file in seconds
+def gated_audio_features(audioFilePath, windowSize, windowStep, gate):
+    with profiling.stage("decode"):
+        [Fs, signal] = audioBasicIO.read_audio_file(audioFilePath)
+        signal = audioBasicIO.stereo_to_mono(signal)
+    profiling.count("bytesRead", os.path.getsize(audioFilePath))
+    with profiling.stage("gate"):
+        active = window_activity(signal, Fs, windowSize, windowStep, gate)
+    with profiling.stage("features"):
+        F = active_features(signal, Fs, windowSize, windowStep, active)
+    profiling.count("gateSkipped", len(active) - len(F))
+    return F, active, len(signal) / float(Fs)
+
+#Computes the Nx204 feature matrix of an already decoded signal
+#Inputs:  signal: audio samples
+#         Fs: sampling rate of signal
+#         windowSize: Size of window in seconds to compute features for
+#         windowStep: Step size of window, overlaps if less than windowSize
+#Outputs: F: Matrix of features, one row per window
+def signal_features(signal, Fs, windowSize, windowStep):
     mF, sF, f_names = MidTermFeatures.mid_feature_extraction(signal, Fs, windowSize * Fs, windowStep * Fs, \
                                                              windowSize * Fs, windowStep * Fs)
     F = np.vstack((sF, mF))
@@ -139,13 +263,10 @@ def test_features(audioPath, windowSize, windowStep):
 #         windowStep: Step size of window, overlaps if less than windowSize
 #Outputs: None
 def interpret_prediction(y_pred, fileName, windowSize, windowStep):
-    file = open(fileName, 'w+')
-    timeWindow = [0.0, windowSize]
-    classes = list(features.keys())
-    for i in range(0,len(y_pred)):
-        file.write("%9.6f	%9.6f	%s\n" % (timeWindow[0], timeWindow[1], classes[y_pred[i]]))
-        timeWindow[0]+=windowStep
-        timeWindow[1]+=windowStep
+    startTimes = np.arange(len(y_pred)) * windowStep
+    with open(fileName, 'w') as file:
+        file.writelines(["%9.6f	%9.6f	%s\n" % (startTimes[i], startTimes[i] + windowSize, classNames[y_pred[i]]) \
+                         for i in range(0,len(y_pred))])
 
 #Takes output text file from interpret_prediction and condenses consecutive labels of the same class to a single time
 #stamp
@@ -153,106 +274,579 @@ def interpret_prediction(y_pred, fileName, windowSize, windowStep):
 #         newFilePath: path for new file with condensed labels
 #Outputs: None
 def condense_labels(filePath, newFilePath):
-    file = open(newFilePath, 'w+')
-    with open(filePath, "r") as labelFile:
+    with open(filePath, "r") as labelFile, open(newFilePath, 'w') as file:
         label = labelFile.readline()
+        if not label:
+            return
         labelData = label.split()
         start = float(labelData[0])
         end = float(labelData[1])
-        currentLabel = []
         previousLabel = labelData[2]
         label = labelFile.readline()
-        if not label:
-            file.write("%9.6f	%9.6f	%s\n" % (start, end, previousLabel))
         while label:
             labelData = label.split()
             currentLabel = labelData[2]
             if currentLabel == previousLabel:
                 end = float(labelData[1])
-            elif currentLabel != previousLabel:
+            else:
                 file.write("%9.6f	%9.6f	%s\n" % (start, end, previousLabel))
                 start = float(labelData[0])
                 end = float(labelData[1])
             previousLabel = currentLabel
             label = labelFile.readline()
+        file.write("%9.6f	%9.6f	%s\n" % (start, end, previousLabel))
+
+#Writes condensed labels from a sequence of prediction chunks as they arrive. Runs of windows with the same class are
+#merged into a single label, a run that reaches the end of a chunk is kept open until a later chunk changes class.
+class LabelCondenser:
+
+    #Inputs:  labelFile: open file the condensed labels are written to
+    #         windowSize: Size of window in seconds the predictions were computed for
+    #         windowStep: Step size of window, overlaps if less than windowSize
+    def __init__(self, labelFile, windowSize, windowStep):
+        self.labelFile = labelFile
+        self.windowSize = windowSize
+        self.windowStep = windowStep
+        #index of the first window of the next chunk
+        self.offset = 0
+        #first window and class of the run that is still open
+        self.runStart = None
+        self.runClass = None
+        #number of labels written
+        self.labels = 0
+
+    #Inputs:  y_pred: (vector) classes of the next windows
+    #Outputs: None
+    def push(self, y_pred):
+        y_pred = np.asarray(y_pred)
+        if len(y_pred) == 0:
+            return
+        #indices where a new run starts
+        starts = np.concatenate(([0], np.flatnonzero(y_pred[1:] != y_pred[:-1]) + 1))
+        runClasses = y_pred[starts]
+        starts = starts + self.offset
+        if self.runStart is not None:
+            if runClasses[0] == self.runClass:
+                starts[0] = self.runStart
+            else:
+                starts = np.concatenate(([self.runStart], starts))
+                runClasses = np.concatenate(([self.runClass], runClasses))
+        self.offset += len(y_pred)
+        #every run but the last one is complete
+        self.write(starts[:-1], starts[1:] - 1, runClasses[:-1])
+        self.runStart = starts[-1]
+        self.runClass = runClasses[-1]
+
+    #Writes the run that is still open, call once after the last chunk
+    def finish(self):
+        if self.runStart is not None:
+            self.write([self.runStart], [self.offset - 1], [self.runClass])
+            self.runStart = None
+
+    #Writes runs given by the indices of their first and last windows
+    def write(self, firstWindows, lastWindows, runClasses):
+        self.labels += len(runClasses)
+        self.labelFile.writelines(["%9.6f	%9.6f	%s\n" % (first * self.windowStep, last * self.windowStep + \
+                                   self.windowSize, classNames[runClass]) \
+                                   for first, last, runClass in zip(firstWindows, lastWindows, runClasses)])
+
+#Takes output of SVM classifier and writes it directly as condensed labels. This gives the same result as
+#interpret_prediction followed by condense_labels without writing and re-reading one line per window: runs of equal
+#classes are found with a single change-point pass over y_pred.
+#Inputs:  y_pred: (vector) The output of the SVM classifier that assigns a class to each time window in audio file
+#         fileName: (string) Name of the file to write the condensed labels to
+#         windowSize: Size of window in seconds to compute features for
+#         windowStep: Step size of window, overlaps if less than windowSize
+#Outputs: labels: number of condensed labels written
+def condense_prediction(y_pred, fileName, windowSize, windowStep):
+    with open(fileName, 'w') as labelFile:
+        condenser = LabelCondenser(labelFile, windowSize, windowStep)
+        condenser.push(y_pred)
+        condenser.finish()
+    return condenser.labels
+
+#Classifies an audio file block by block. Features of each block of samples are extracted and classified as soon as it
+#is read and the condensed labels are written incrementally, so memory use depends on blockSeconds and not on the
+#length of the recording. The result is identical to classifying the whole file at once.
+#Inputs:  audioFilePath: path to WAV file to be classified
+#         labelFilePath: path of the condensed label file to write
+#         windowSize: Size of window in seconds to compute features for
+#         windowStep: Step size of window, overlaps if less than windowSize
+#         blockSeconds: seconds of audio read per block
+#Outputs: audioSeconds: length of the audio file in seconds
+#         windows: number of windows classified
+def stream_classify(audioFilePath, labelFilePath, windowSize, windowStep, blockSeconds):
+    [Fs, signal] = open_signal(audioFilePath)
+    blockSamples = max(int(blockSeconds * Fs), 1)
+    with profiling.stage("decode"):
+        dcOffset, maxAmplitude = signal_stats(signal, blockSamples)
+    profiling.count("bytesRead", signal.nbytes)
+    extractor = StreamingFeatureExtractor(Fs, windowSize, windowStep, dcOffset, maxAmplitude)
+    windows = 0
+    with open(labelFilePath, 'w') as labelFile:
+        condenser = LabelCondenser(labelFile, windowSize, windowStep)
+        blockStart = 0
+        while blockStart < len(signal) or blockStart == 0:
+            with profiling.stage("features"):
+                F = extractor.push(read_block(signal, blockStart, blockStart + blockSamples))
+                blockStart += blockSamples
+                if blockStart >= len(signal):
+                    F = np.concatenate((F, extractor.finish()))
+            if len(F) > 0:
+                with profiling.stage("predict"):
+                    y_pred = svclassifier.predict(F)
+                with profiling.stage("labels_write"):
+                    condenser.push(y_pred)
+                    labelFile.flush()
+                windows += len(F)
+        with profiling.stage("labels_write"):
+            condenser.finish()
+    profiling.count("windows", windows)
+    profiling.count("labels", condenser.labels)
+    return len(signal) / float(Fs), windows
+
+#Finds the Audacity label files in labelDir/<site>/ and the audio file each one belongs to. Audio files are looked up
+#by name anywhere under audioDir, so 5E6BA3C8_labelled.txt matches e.g. audioDir/Anderson-selected/5E6BA3C8.WAV
+#Inputs:  labelDir: directory with one sub-directory of label files per site
+#         audioDir: directory searched recursively for .wav files
+#         sites: names of the sites to use, all sub-directories of labelDir if empty
+#Outputs: pairs: list of (labelFilePath, audioFilePath)
+#         missing: list of label files without an audio file
+def find_training_pairs(labelDir, audioDir, sites=None):
+    audioIndex = index_audio_files(audioDir)
+    if not sites:
+        sites = sorted(name for name in os.listdir(labelDir) if os.path.isdir(os.path.join(labelDir, name)))
+    pairs = []
+    missing = []
+    for site in sites:
+        siteDir = os.path.join(labelDir, site)
+        for name in sorted(os.listdir(siteDir)):
+            if not name.endswith("_labelled.txt"):
+                continue
+            audioName = name.split("_")[0].upper()
+            if audioName in audioIndex:
+                pairs.append((os.path.join(siteDir, name), audioIndex[audioName]))
+            else:
+                missing.append(os.path.join(siteDir, name))
+    return pairs, missing
+
+#Finds every .wav file below audioDir
+#Outputs: audioIndex: dictionary mapping the upper case audio name (see audio_name) to the path of the file
+def index_audio_files(audioDir):
+    audioIndex = {}
+    for root, dirs, files in os.walk(audioDir):
+        for name in files:
+            if os.path.splitext(name)[1].lower() == ".wav":
+                audioIndex[audio_name(name).upper()] = os.path.join(root, name)
+    return audioIndex
+
+#Unpacks the argument tuple for label_features inside a pool worker, profiled as one train_file task
+def training_features_job(job):
+    with profiling.task("train_file", file=job[1]):
+        return label_features(*job)
+
+#Trains the SVM on labelled audio files. Labels are parsed first so class indices follow the order of the label files,
+#then the features of all audio files are extracted in parallel and collected in the global feature store in file order
+#Inputs:  pairs: list of (labelFilePath, audioFilePath)
+#         windowSize: specifies size of window in seconds
+#         windowStep: specifies size of step in seconds
+#         workers: number of worker processes for feature extraction
+#         classifierName: classifier backend to fit, a key of classifiers.CLASSIFIERS
+#Outputs: timings: dictionary with the seconds spent parsing labels, extracting features and fitting the classifier
+#         audioSeconds: total length of the training audio in seconds
+def train(pairs, windowSize, windowStep, workers, classifierName='svc'):
+    global svclassifier, classNames
+    timings = {}
+    start = time.perf_counter()
+    with profiling.task("parse_labels", files=len(pairs)), profiling.stage("labels_read"):
+        for labelFilePath, audioFilePath in pairs:
+            process_label(labelFilePath)
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    jobs = [(labels[os.path.basename(labelFilePath).split("_")[0]], audioFilePath, windowSize, windowStep) \
+            for labelFilePath, audioFilePath in pairs]
+    audioSeconds = 0.0
+    if workers > 1 and len(jobs) > 1:
+        with Pool(processes=workers, initializer=init_worker, initargs=([], None, featureCache)) as pool:
+            results = list(pool.imap(training_features_job, jobs))
+    else:
+        results = [training_features_job(job) for job in jobs]
+    for classRows, fileSeconds in results:
+        for soundType, rows in classRows:
+            features.append(soundType, rows)
+        audioSeconds += fileSeconds
+    timings["extract"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrix, classLabels = dict_to_training_matrix(features)
+    with profiling.task("fit", classifier=classifierName), profiling.stage("fit"):
+        svclassifier = make_classifier(classifierName)
+        svclassifier.fit(matrix, classLabels)
+        profiling.count("windows", len(matrix))
+    classNames = list(features.keys())
+    timings["fit"] = time.perf_counter() - start
+    return timings, audioSeconds
+
+#Writes the learned features and trained SVM to a new versioned model directory, together with the slim inference model
+#used for classification and a model.json manifest describing how the model was trained
+#Inputs:  modelsDir: directory the versioned model directory is created in
+#         manifest: dictionary of training details added to model.json
+#Outputs: modelDir: path of the new model directory, modelsDir/<version>
+def save_model(modelsDir, manifest):
+    version = time.strftime("%Y%m%d-%H%M%S")
+    modelDir = os.path.join(modelsDir, version)
+    suffix = 1
+    while os.path.exists(modelDir):
+        modelDir = os.path.join(modelsDir, "%s-%d" % (version, suffix))
+        suffix += 1
+    os.makedirs(modelDir)
+    #Save Features
+    with open(os.path.join(modelDir, 'learned_features.pkl'), 'wb') as output:
+        pickle.dump(features, output)
+    #Save trained SVM
+    with open(os.path.join(modelDir, 'trained_SVM.pkl'), 'wb') as out:
+        pickle.dump(svclassifier, out)
+    export_inference_model(svclassifier, classNames, {"windowSize": manifest["windowSize"], \
+                                                      "windowStep": manifest["windowStep"]}, modelDir)
+    manifest = dict(manifest, version=os.path.basename(modelDir), classNames=classNames, \
+                    windows={soundType: len(features.class_rows(soundType)) for soundType in classNames}, \
+                    pyAudioAnalysis=metadata.version("pyAudioAnalysis"), sklearn=metadata.version("scikit-learn"))
+    with open(os.path.join(modelDir, 'model.json'), 'w') as manifestFile:
+        json.dump(manifest, manifestFile, indent=2)
+    return modelDir
+
+#Expands the command line inputs into a sorted list of audio files
+#Inputs:  paths: list of audio files, directories or glob patterns
+#Outputs: audioFiles: list of paths to audio files
+def find_audio_files(paths):
+    audioFiles = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in os.listdir(path):
+                if os.path.splitext(name)[1].lower() == ".wav":
+                    audioFiles.append(os.path.join(path, name))
+        elif os.path.isfile(path):
+            audioFiles.append(path)
+        else:
+            audioFiles.extend(glob.glob(path))
+    return sorted(set(audioFiles))
+
+#Returns the name of an audio file without directory or extension, e.g. 5E6BA3C8 for /data/5E6BA3C8.WAV
+def audio_name(audioFilePath):
+    return os.path.splitext(os.path.basename(audioFilePath))[0]
+
+#Classifies one audio file using the loaded SVM and writes its label files
+#Inputs:  audioFilePath: path to audio file to be classified
+#         outputDir: directory the condensed labels are written to
+#         windowSize: Size of window in seconds to compute features for
+#         windowStep: Step size of window, overlaps if less than windowSize
+#         blockSeconds: if given the file is classified in blocks of this many seconds with stream_classify
+#         uncompressedDir: if given the per window labels are also written to this directory for debugging
+#         gate: if given only the windows passing the activity gate with these settings are classified, the others
+#         are labelled gate["label"]
+#Outputs: stats: dictionary with the file name, seconds of audio, number of windows, number of windows skipped by the
+#         gate and wall time
+def classify_file(audioFilePath, outputDir, windowSize, windowStep, blockSeconds=None, uncompressedDir=None, \
+                  gate=None):
+    start = time.perf_counter()
+    audioName = audio_name(audioFilePath)
+    if blockSeconds is not None:
+        audioSeconds, windows = stream_classify(audioFilePath, os.path.join(outputDir, audioName + "_labelled.txt"), \
+                                                windowSize, windowStep, blockSeconds)
+        return {"file": audioFilePath, "audioSeconds": audioSeconds, "windows": windows, "skipped": 0, \
+                "seconds": time.perf_counter() - start}
+    skipped = 0
+    if gate is not None:
+        x_test, active, audioSeconds = gated_audio_features(audioFilePath, windowSize, windowStep, gate)
+        y_pred = np.full(len(active), classNames.index(gate["label"]))
+        if len(x_test) > 0:
+            with profiling.stage("predict"):
+                y_pred[active] = svclassifier.predict(x_test)
+        skipped = len(active) - len(x_test)
+    else:
+        x_test, audioSeconds = audio_features(audioFilePath, windowSize, windowStep)
+        with profiling.stage("predict"):
+            y_pred = svclassifier.predict(x_test)
+    with profiling.stage("labels_write"):
+        labelCount = condense_prediction(y_pred, os.path.join(outputDir, audioName + "_labelled.txt"), windowSize, \
+                                         windowStep)
+        if uncompressedDir is not None:
+            interpret_prediction(y_pred, os.path.join(uncompressedDir, audioName + "_labelled_UC.txt"), windowSize, \
+                                 windowStep)
+    profiling.count("windows", len(y_pred))
+    profiling.count("labels", labelCount)
+    return {"file": audioFilePath, "audioSeconds": audioSeconds, "windows": len(y_pred), "skipped": skipped, \
+            "seconds": time.perf_counter() - start}
+
+#Pool initializer, hands the model loaded and the feature cache opened by the parent process to each worker
+def init_worker(workerClassNames, workerClassifier, workerFeatureCache):
+    global classNames, svclassifier, featureCache
+    classNames = workerClassNames
+    svclassifier = workerClassifier
+    featureCache = workerFeatureCache
+
+#Unpacks the argument tuple for classify_file inside a pool worker, profiled as one classify task. A file that cannot
+#be classified, e.g. because it is corrupt or shorter than one window, does not stop the other files: its stats hold
+#the error instead.
+def classify_job(job):
+    start = time.perf_counter()
+    try:
+        with profiling.task("classify", file=job[0]):
+            return classify_file(*job)
+    except Exception as error:
+        return {"file": job[0], "error": "%s: %s" % (type(error).__name__, error), \
+                "seconds": time.perf_counter() - start}
+
+#Prints throughput of a single classified file, or the error if it failed
+def print_file_stats(stats):
+    if "error" in stats:
+        print("%s: failed, %s" % (stats["file"], stats["error"]))
+        return
+    gated = ""
+    if stats["skipped"]:
+        gated = ", %.1f%% skipped by the gate" % (100.0 * stats["skipped"] / stats["windows"])
+    print("%s: %.1f s audio, %d windows in %.2f s (%.1fx realtime, %.0f windows/s%s)" % \
+          (stats["file"], stats["audioSeconds"], stats["windows"], stats["seconds"], \
+           stats["audioSeconds"] / stats["seconds"], stats["windows"] / stats["seconds"], gated))
+
+#Classifies a list of audio files, using a pool of worker processes if workers > 1
+#Inputs:  audioFiles: list of paths to audio files
+#         outputDir: directory the condensed labels are written to
+#         windowSize: Size of window in seconds to compute features for
+#         windowStep: Step size of window, overlaps if less than windowSize
+#         workers: number of worker processes
+#         blockSeconds: if given files are streamed in blocks of this many seconds
+#         uncompressedDir: if given the per window labels are also written to this directory
+#         gate: if given only windows passing the activity gate with these settings are classified
+#Outputs: allStats: list of per-file statistics returned by classify_file, or holding the error of a failed file
+def classify_files(audioFiles, outputDir, windowSize, windowStep, workers, blockSeconds=None, uncompressedDir=None, \
+                   gate=None):
+    os.makedirs(outputDir, exist_ok=True)
+    if uncompressedDir is not None:
+        os.makedirs(uncompressedDir, exist_ok=True)
+    jobs = [(audioFilePath, outputDir, windowSize, windowStep, blockSeconds, uncompressedDir, gate) \
+            for audioFilePath in audioFiles]
+    allStats = []
+    if workers > 1 and len(jobs) > 1:
+        with Pool(processes=workers, initializer=init_worker, \
+                  initargs=(classNames, svclassifier, featureCache)) as pool:
+            for stats in pool.imap_unordered(classify_job, jobs):
+                print_file_stats(stats)
+                allStats.append(stats)
+    else:
+        for job in jobs:
+            stats = classify_job(job)
+            print_file_stats(stats)
+            allStats.append(stats)
+    return allStats
+
+#Classifies the audio files given on the command line
+def run_classify(args, parser):
+    audioFiles = find_audio_files(args.audioFilePaths)
+    if not audioFiles:
+        parser.error("no audio files found")
+
+    gate = None
+    if args.gate:
+        if args.block_seconds is not None:
+            parser.error("--gate cannot be combined with --stream")
+        gate = dict(DEFAULT_GATE, label=args.gate_label, thresholdDb=args.gate_threshold, fluxRatio=args.gate_flux, \
+                    padSeconds=args.gate_pad)
+
+    #Classifies audio using SVM
+    wallStart = time.perf_counter()
+    with profiling.task("load_model", model=args.model_dir):
+        config = load_model(args.model_dir)
+    if gate is not None and gate["label"] not in classNames:
+        parser.error("--gate-label %s is not a class of the model" % gate["label"])
+    allStats = classify_files(audioFiles, args.output_dir, config["windowSize"], config["windowStep"], args.workers, \
+                              args.block_seconds, args.uncompressed_dir, gate)
+    wallTime = time.perf_counter() - wallStart
+
+    failed = [stats for stats in allStats if "error" in stats]
+    allStats = [stats for stats in allStats if "error" not in stats]
+    totalAudio = sum(stats["audioSeconds"] for stats in allStats)
+    totalWindows = sum(stats["windows"] for stats in allStats)
+    print("")
+    print("Classified %d files: %.1f s audio, %d windows in %.2f s wall time" % \
+          (len(allStats), totalAudio, totalWindows, wallTime))
+    print("    %.1fx realtime, %.0f windows/s, %.2f files/s" % \
+          (totalAudio / wallTime, totalWindows / wallTime, len(allStats) / wallTime))
+    if gate is not None and totalWindows:
+        skipped = sum(stats["skipped"] for stats in allStats)
+        print("    gate labelled %.1f%% of the windows %s without extracting features, %d of %d windows classified" % \
+              (100.0 * skipped / totalWindows, gate["label"], totalWindows - skipped, totalWindows))
+        if skipped < totalWindows:
+            print("    feature extraction and prediction did %.2fx less work (measure the wall time speedup with" % \
+                  (totalWindows / float(totalWindows - skipped)) + " benchmark.py --gate)")
+    if failed:
+        print("")
+        print("Failed to classify %d of %d files:" % (len(failed), len(failed) + len(allStats)))
+        for stats in failed:
+            print("    %s: %s" % (stats["file"], stats["error"]))
+        sys.exit(1)
+
+#Trains and saves a new model from the label files and audio directory given on the command line
+def run_train(args, parser):
+    pairs, missing = find_training_pairs(args.label_dir, args.audio_dir, args.sites)
+    for labelFilePath in missing:
+        print("Warning: no audio file found for " + labelFilePath)
+    if not pairs:
+        parser.error("no labelled audio files found")
+
+    timings, audioSeconds = train(pairs, 0.25, 0.025, args.workers, args.classifier)
+    start = time.perf_counter()
+    with profiling.task("save_model", models=args.models_dir):
+        modelDir = save_model(args.models_dir, {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "windowSize": 0.25, \
+                                                "windowStep": 0.025, "classifier": args.classifier, \
+                                                "classifierDescription": CLASSIFIER_DESCRIPTIONS[args.classifier], \
+                                                "trainingFiles": [list(pair) for pair in pairs], "timings": timings})
+    timings["save"] = time.perf_counter() - start
+
+    print("Trained on %d files, %.1f s audio, %d windows, %d classes" % \
+          (len(pairs), audioSeconds, len(features), len(classNames)))
+    for stage in ("parse", "extract", "fit", "save"):
+        print("    %-8s %8.2f s" % (stage, timings[stage]))
+    print("Model written to " + modelDir)
+    print("Classify with: python3 proj4.py --model-dir " + modelDir + " audioFilePath")
+
+#Writes the slim inference model of the pickled model in a model directory, for models trained before it existed
+def run_export(args, parser):
+    config = load_model(args.model_dir)
+    if isinstance(svclassifier, InferenceModel):
+        parser.error(args.model_dir + " already contains an inference model")
+    export_inference_model(svclassifier, classNames, config, args.model_dir)
+    print("Inference model written to " + args.model_dir)
+
+#Computes the features of one classification request of the service, run in the request thread or in a worker of the
+#feature extraction pool
+#Inputs:  request: dictionary with either "path", the path of an audio file, or "pcm", raw 16 bit little endian samples
+#         with their sampling "rate" and number of "channels" (see classify_service.pcm_signal)
+#         windowSize: Size of window in seconds to compute features for
+#         windowStep: Step size of window, overlaps if less than windowSize
+#Outputs: F: Matrix of features, one row per window
+#         audioSeconds: length of the audio in seconds
+def request_features(request, windowSize, windowStep):
+    if "path" in request:
+        return audio_features(request["path"], windowSize, windowStep)
+    signal, Fs = pcm_signal(request)
+    return signal_features(signal, Fs, windowSize, windowStep), len(signal) / float(Fs)
+
+#Runs the classification service until interrupted
+def run_serve(args, parser):
+    with profiling.task("load_model", model=args.model_dir):
+        config = load_model(args.model_dir)
+    extractPool = None
+    if args.workers > 1:
+        extractPool = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, \
+                                          initargs=([], None, featureCache))
+    server = make_server(args.host, args.port, svclassifier, classNames, config, request_features, LabelCondenser, \
+                         args.batch_windows, args.batch_delay / 1000.0, args.output_dir, extractPool)
+    print("Serving %d classes on http://%s:%d/classify (metrics at /metrics)" % \
+          (len(classNames), args.host, server.server_address[1]))
+    serve(server)
+
+if __name__ == '__main__':
+    #Parse command and paths from terminal
+    parser = argparse.ArgumentParser(description=description, formatter_class=RawTextHelpFormatter)
+    commonParser = argparse.ArgumentParser(add_help=False)
+    commonParser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), \
+                              help="Number of worker processes (default: number of CPUs)")
+    commonParser.add_argument('--cache-dir', default=os.environ.get("PROJ4_FEATURE_CACHE"), \
+                              help="Directory of the feature cache, disabled if not given\n" + \
+                                   "(default: $PROJ4_FEATURE_CACHE)")
+    commonParser.add_argument('--cache-size', type=float, \
+                              default=float(os.environ.get("PROJ4_FEATURE_CACHE_MB", 4096)), \
+                              help="Size bound of the feature cache in MB (default: $PROJ4_FEATURE_CACHE_MB or 4096)")
+    commonParser.add_argument('--profile', metavar='TRACE', \
+                              help="Append stage timings and counters of every file as JSON lines to TRACE,\n" + \
+                                   "summarize with profiling.py (default: $PROJ4_PROFILE, disabled if unset)")
+    subparsers = parser.add_subparsers(dest='command')
+
+    classifyParser = subparsers.add_parser('classify', parents=[commonParser], formatter_class=RawTextHelpFormatter, \
+                                           help="Classify audio files (default command)")
+    classifyParser.add_argument('audioFilePaths', metavar='audioFilePath', nargs='+', \
+                                type=str, help="Audio file, directory of .wav files or glob pattern to be classified")
+    classifyParser.add_argument('-o', '--output-dir', default="machine_labels", \
+                                help="Directory for the condensed label files (default: machine_labels)")
+    classifyParser.add_argument('--model-dir', default=".", \
+                                help="Directory with the inference model or with learned_features.pkl and\n" + \
+                                     "trained_SVM.pkl (default: .)")
+    classifyParser.add_argument('--stream', type=float, metavar='SECONDS', dest='block_seconds', \
+                                help="Classify WAV files block by block, reading this many seconds at a time,\n" + \
+                                     "so memory use stays bounded for recordings of any length")
+    classifyParser.add_argument('--uncompressed-dir', metavar='DIR', \
+                                help="Also write one label per window to DIR/<name>_labelled_UC.txt for debugging")
+    classifyParser.add_argument('--gate', action='store_true', \
+                                help="Skip feature extraction and classification of silent or steady noise\n" + \
+                                     "windows found by a fast energy and spectral flux pass, and give them\n" + \
+                                     "--gate-label")
+    classifyParser.add_argument('--gate-label', default=DEFAULT_GATE["label"], \
+                                help="Class of the windows skipped by the gate (default: %s)" % DEFAULT_GATE["label"])
+    classifyParser.add_argument('--gate-threshold', type=float, default=DEFAULT_GATE["thresholdDb"], metavar='DB', \
+                                help="Energy above the noise floor that makes a window active (default: %g)" % \
+                                     DEFAULT_GATE["thresholdDb"])
+    classifyParser.add_argument('--gate-flux', type=float, default=DEFAULT_GATE["fluxRatio"], metavar='RATIO', \
+                                help="Spectral flux, relative to its median, that makes a window active\n" + \
+                                     "(default: %g)" % DEFAULT_GATE["fluxRatio"])
+    classifyParser.add_argument('--gate-pad', type=float, default=DEFAULT_GATE["padSeconds"], metavar='SECONDS', \
+                                help="Seconds around active windows that are classified as well (default: %g)" % \
+                                     DEFAULT_GATE["padSeconds"])
+
+    trainParser = subparsers.add_parser('train', parents=[commonParser], formatter_class=RawTextHelpFormatter, \
+                                        help="Train a new model from label files")
+    trainParser.add_argument('--audio-dir', required=True, \
+                             help="Directory searched recursively for the audio files of the label files")
+    trainParser.add_argument('--label-dir', default="label_files", \
+                             help="Directory with one sub-directory of label files per site (default: label_files)")
+    trainParser.add_argument('--sites', nargs='+', \
+                             help="Sites to train on (default: every sub-directory of the label directory)")
+    trainParser.add_argument('--classifier', choices=sorted(CLASSIFIERS), default='svc', \
+                             help="Classifier backend (default: svc)\n" + \
+                                  "    svc: libsvm SVC(kernel='linear'), training time grows super-linearly\n" + \
+                                  "    linear: linear SVM on standardized features trained with minibatch SGD\n" + \
+                                  "    logistic: logistic regression on standardized features, minibatch SGD")
+    trainParser.add_argument('--models-dir', default="models", \
+                             help="Directory the versioned model directory is written to (default: models)")
+
+    exportParser = subparsers.add_parser('export', formatter_class=RawTextHelpFormatter, \
+                                         help="Write the slim inference model of a pickled model")
+    exportParser.add_argument('--model-dir', default=".", \
+                              help="Directory with learned_features.pkl and trained_SVM.pkl (default: .)")
+
+    serveParser = subparsers.add_parser('serve', parents=[commonParser], formatter_class=RawTextHelpFormatter, \
+                                        help="Run a local HTTP classification service with the model kept loaded")
+    serveParser.add_argument('--model-dir', default=".", \
+                             help="Directory with the inference model or with learned_features.pkl and\n" + \
+                                  "trained_SVM.pkl (default: .)")
+    serveParser.add_argument('--host', default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    serveParser.add_argument('--port', type=int, default=8765, help="Port to listen on (default: 8765)")
+    serveParser.add_argument('--batch-delay', type=float, default=5.0, metavar='MS', \
+                             help="Milliseconds to wait for more requests before predicting a batch (default: 5)")
+    serveParser.add_argument('--batch-windows', type=int, default=65536, \
+                             help="Largest number of windows predicted in one batch (default: 65536)")
+    serveParser.add_argument('-o', '--output-dir', \
+                             help="Also write the condensed labels of every request to this directory")
+
+    #"python3 proj4.py audioFilePath" is short for "python3 proj4.py classify audioFilePath"
+    argv = sys.argv[1:]
+    if argv and argv[0] not in subparsers.choices and argv[0] not in ('-h', '--help'):
+        argv = ['classify'] + argv
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.error("no command or audio file given")
+
+    if getattr(args, 'profile', None):
+        profiling.enable(args.profile)
+    if getattr(args, 'cache_dir', None):
+        featureCache = FeatureCache(args.cache_dir, int(args.cache_size * 2**20))
 
-# #Anderson Files
-# process_label("/Users/omarwali/ece4271/project4/label_files/anderson/5E6BA3C8_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/anderson/5E6BA406_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/anderson/5E6BA444_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/anderson/5E6C7D44_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/anderson/5E6CB992_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/anderson/5E6BD3FA_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/anderson/5E6BD2C4_labelled.txt")
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/Anderson-serviceberry-selected/5E6BA3C8.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/Anderson-serviceberry-selected/5E6BA406.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/Anderson-serviceberry-selected/5E6BA444.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/Anderson-serviceberry-selected/5E6C7D44.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/Anderson-serviceberry-selected/5E6CB992.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/Anderson-serviceberry-selected/5E6BD3FA.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/Anderson-serviceberry-selected/5E6BD2C4.WAV", 0.25, 0.025)
-# #CherryEmerson Files
-# process_label("/Users/omarwali/ece4271/project4/label_files/cherry_emerson/5E635A43_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/cherry_emerson/5E635B3B_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/cherry_emerson/5E635FD5_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/cherry_emerson/5E636E5D_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/cherry_emerson/5E638A75_labelled.txt")
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/CherryEmerson-selected/5E635A43.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/CherryEmerson-selected/5E635B3B.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/CherryEmerson-selected/5E635FD5.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/CherryEmerson-selected/5E636E5D.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/CherryEmerson-selected/5E638A75.WAV", 0.25, 0.025)
-# #EBB Files
-# process_label("/Users/omarwali/ece4271/project4/label_files/ebb/5E63D4B9_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/ebb/5E63D5EF_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/ebb/5E63D6E7_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/ebb/5E63D7A1_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/ebb/5E63D7DF_labelled.txt")
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/EBB-selected/5E63D4B9.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/EBB-selected/5E63D5EF.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/EBB-selected/5E63D6E7.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/EBB-selected/5E63D7A1.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/EBB-selected/5E63D7DF.WAV", 0.25, 0.025)
-# #Architecture Files
-# process_label("/Users/omarwali/ece4271/project4/label_files/architecture/5E678967_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/architecture/5E679209_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/architecture/5E679515_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/architecture/5E679597_labelled.txt")
-# process_label("/Users/omarwali/ece4271/project4/label_files/architecture/5E679821_labelled.txt")
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/ArchitectureWest-selected/5E678967.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/ArchitectureWest-selected/5E679209.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/ArchitectureWest-selected/5E679515.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/ArchitectureWest-selected/5E679597.WAV", 0.25, 0.025)
-# process_learning_features(labels,"/Users/omarwali/ece4271/project4/ArchitectureWest-selected/5E679821.WAV", 0.25, 0.025)
-#
-# #Save Features
-# output = open('learned_features.pkl', 'wb')
-# pickle.dump(features, output)
-# output.close()
-#
-# #Train SVM
-# matrix, classLabels = dict_to_training_matrix(features)
-# svclassifier = SVC(kernel='linear')
-# svclassifier.fit(matrix, classLabels)
-#
-# #Save trained SVM
-# out = open('trained_SVM.pkl', 'wb')
-# pickle.dump(svclassifier, out)
-# out.close()
-
-#Parse File Path from terminal
-parser = argparse.ArgumentParser(description=description, formatter_class=RawTextHelpFormatter)
-parser.add_argument('audioFilePath', metavar='audioFilePath', \
-                    type=str, help="Path to audio file to be classified")
-args = parser.parse_args()
-audioFilePath = args.audioFilePath
-
-#Get Audio Name
-audioName = audioFilePath[-12:]
-audioName = audioName.split(".")[0]
-
-#Classifies audio using SVM
-x_test = test_features(audioFilePath, 0.25, 0.025)
-y_pred = svclassifier.predict(x_test)
-interpret_prediction(y_pred,"uncompressed_labels/" + audioName + "_labelled_UC.txt",0.25,0.025)
-condense_labels("uncompressed_labels/" + audioName + "_labelled_UC.txt", "machine_labels/" + audioName + "_labelled.txt")
+    if args.command == 'train':
+        run_train(args, parser)
+    elif args.command == 'export':
+        run_export(args, parser)
+    elif args.command == 'serve':
+        run_serve(args, parser)
+    else:
+        run_classify(args, parser)
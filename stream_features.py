@@ -0,0 +1,211 @@
+import numpy as np
+from collections import deque
+from importlib import metadata
+from scipy.fftpack import fft
+from scipy.io import wavfile
+from pyAudioAnalysis import MidTermFeatures, ShortTermFeatures
+
+#Block-wise version of MidTermFeatures.mid_feature_extraction with the short and mid term window both set to windowSize
+#and both steps set to windowStep, the configuration used by proj4.py. Blocks of samples are pushed in order and the
+#feature rows of every window that is complete so far are returned, so a recording of any length can be processed with
+#bounded memory. All state that pyAudioAnalysis keeps between windows is carried over block boundaries: the samples of
+#windows that straddle the boundary, the previous FFT magnitude (spectral flux), the previous feature vector (deltas)
+#and the short term features still needed by mid term statistics. pyAudioAnalysis normalizes the whole signal by its
+#DC offset and peak amplitude before windowing, so these two values have to be known up front (see signal_stats).
+#short_term repeats the per window code of pyAudioAnalysis, so the first extractor of every configuration is checked
+#against mid_feature_extraction (see verify_extractor) to catch a pyAudioAnalysis version that computes differently.
+class StreamingFeatureExtractor:
+
+    #Inputs:  Fs: sampling rate of the signal
+    #         windowSize: size of window in seconds
+    #         windowStep: step of window in seconds
+    #         dcOffset: mean of the whole signal after scaling by 2^-15
+    #         maxAmplitude: peak absolute amplitude of the whole signal after scaling and DC removal
+    #         fluxLags: also compute the spectral flux of every window against the window this many steps before it,
+    #         for every lag given, collected in lagFluxes (see multi_step_features)
+    def __init__(self, Fs, windowSize, windowStep, dcOffset, maxAmplitude, fluxLags=()):
+        if (Fs, windowSize, windowStep) not in verifiedConfigs:
+            verify_extractor(Fs, windowSize, windowStep)
+        self.Fs = Fs
+        self.window = int(windowSize * Fs)
+        self.step = int(windowStep * Fs)
+        self.dcOffset = dcOffset
+        self.scale = maxAmplitude + 1e-10
+        self.numFFT = int(self.window / 2)
+        self.fbank, freqs = ShortTermFeatures.mfcc_filter_banks(Fs, self.numFFT)
+        #same window ratios as mid_feature_extraction
+        self.midRatio = round((windowSize * Fs - (windowSize * Fs - windowStep * Fs)) / (windowStep * Fs))
+        #samples not yet covered by a complete window
+        self.pending = np.zeros(0)
+        self.previousFFT = None
+        self.previousFeatures = None
+        #short term feature vectors whose mid term statistics are not complete yet
+        self.shortFrames = []
+        #FFT magnitudes of the last windows and the spectral flux of every window at each lag
+        self.fluxLags = sorted(set(lag for lag in fluxLags if lag > 1))
+        self.history = deque(maxlen=max(self.fluxLags, default=1))
+        self.lagFluxes = {lag: [] for lag in self.fluxLags}
+
+    #Extracts the features of all windows completed by a block of samples
+    #Inputs:  block: next samples of the signal, as read from the file
+    #Outputs: F: matrix with one 204 feature row per window, possibly with zero rows
+    def push(self, block):
+        signal = np.concatenate((self.pending, (np.double(block) / (2.0 ** 15) - self.dcOffset) / self.scale))
+        position = 0
+        while position + self.window - 1 < len(signal):
+            self.shortFrames.append(self.short_term(signal[position:position + self.window]))
+            position += self.step
+        self.pending = signal[position:]
+        return self.mid_term(final=False)
+
+    #Returns the features of the windows at the end of the signal whose mid term statistics were still open
+    def finish(self):
+        return self.mid_term(final=True)
+
+    #Short term features of one window, the per window body of ShortTermFeatures.feature_extraction
+    def short_term(self, x):
+        fft_magnitude = abs(fft(x))
+        fft_magnitude = fft_magnitude[0:self.numFFT]
+        fft_magnitude = fft_magnitude / len(fft_magnitude)
+        if self.previousFFT is None:
+            self.previousFFT = fft_magnitude.copy()
+        feature_vector = np.zeros(34)
+        feature_vector[0] = ShortTermFeatures.zero_crossing_rate(x)
+        feature_vector[1] = ShortTermFeatures.energy(x)
+        feature_vector[2] = ShortTermFeatures.energy_entropy(x)
+        [feature_vector[3], feature_vector[4]] = ShortTermFeatures.spectral_centroid_spread(fft_magnitude, self.Fs)
+        feature_vector[5] = ShortTermFeatures.spectral_entropy(fft_magnitude)
+        feature_vector[6] = ShortTermFeatures.spectral_flux(fft_magnitude, self.previousFFT)
+        for lag in self.fluxLags:
+            #the first windows have no window lag steps before them and are compared with themselves, like the first
+            #window of a signal
+            previous = self.history[-lag] if len(self.history) >= lag else fft_magnitude
+            self.lagFluxes[lag].append(ShortTermFeatures.spectral_flux(fft_magnitude, previous))
+        if self.fluxLags:
+            self.history.append(fft_magnitude)
+        feature_vector[7] = ShortTermFeatures.spectral_rolloff(fft_magnitude, 0.90)
+        feature_vector[8:21] = ShortTermFeatures.mfcc(fft_magnitude, self.fbank, 13)
+        chroma_names, chroma_feature_matrix = ShortTermFeatures.chroma_features(fft_magnitude, self.Fs, self.numFFT)
+        feature_vector[21:33] = chroma_feature_matrix[:, 0]
+        feature_vector[33] = chroma_feature_matrix.std()
+        if self.previousFeatures is None:
+            delta = np.zeros(34)
+        else:
+            delta = feature_vector - self.previousFeatures
+        self.previousFeatures = feature_vector
+        self.previousFFT = fft_magnitude.copy()
+        return np.concatenate((feature_vector, delta))
+
+    #Returns the output rows of every window whose mid term window is complete, or of all remaining windows if final
+    #is set
+    def mid_term(self, final):
+        F = mid_term_rows(self.shortFrames, self.midRatio, final)
+        del self.shortFrames[:len(F)]
+        return F
+
+#Builds the output rows [short term features, mid term means, mid term standard deviations] of mid_feature_extraction
+#Inputs:  shortFrames: list of 68 short term feature vectors (features and deltas)
+#         midRatio: number of short term frames in a mid term window
+#         final: if set rows are built for all frames, otherwise only for frames whose mid term window is complete
+#Outputs: F: matrix with one 204 feature row per frame used, the frames used are the first len(F)
+def mid_term_rows(shortFrames, midRatio, final):
+    rows = []
+    count = 0
+    while count < len(shortFrames) and (final or count + midRatio <= len(shortFrames)):
+        frames = np.array(shortFrames[count:count + midRatio])
+        midFeatures = np.nan_to_num(np.concatenate((np.mean(frames, 0), np.std(frames, 0))))
+        rows.append(np.concatenate((shortFrames[count], midFeatures)))
+        count += 1
+    if not rows:
+        return np.zeros((0, 204))
+    return np.array(rows)
+
+#Computes the mid_feature_extraction matrices of one window size at several window steps in a single pass. When a step
+#is a whole multiple k of the finest step (in samples) its windows are every k-th window of the finest step, so all
+#features computed from a window alone (energy, spectral shape, MFCCs, chroma) are shared. Only the features that
+#link a window to the one before it differ: the spectral flux, computed in the same pass against the window k steps
+#back, and the deltas, recomputed from the subsampled features. The matrices are identical to those of
+#mid_feature_extraction at each step.
+#Inputs:  signal: mono audio samples
+#         Fs: sampling rate of signal
+#         windowSize: size of window in seconds
+#         windowSteps: steps of window in seconds, the sample count of each must be a multiple of that of the finest
+#Outputs: features: dictionary mapping every window step to its feature matrix
+def multi_step_features(signal, Fs, windowSize, windowSteps):
+    baseStep = min(windowSteps, key=lambda windowStep: int(windowStep * Fs))
+    baseSamples = int(baseStep * Fs)
+    lags = {}
+    for windowStep in windowSteps:
+        if int(windowStep * Fs) % baseSamples != 0:
+            raise ValueError("window step %g is not a multiple of %g" % (windowStep, baseStep))
+        lags[windowStep] = int(windowStep * Fs) // baseSamples
+    extractor = StreamingFeatureExtractor(Fs, windowSize, baseStep, *signal_stats(signal, max(len(signal), 1)), \
+                                          fluxLags=lags.values())
+    F = np.concatenate((extractor.push(signal), extractor.finish()))
+    features = {}
+    for windowStep, lag in lags.items():
+        if lag == 1:
+            features[windowStep] = F
+            continue
+        shortFeatures = F[::lag, :34].copy()
+        shortFeatures[:, 6] = np.array(extractor.lagFluxes[lag])[::lag]
+        deltas = np.zeros(shortFeatures.shape)
+        deltas[1:] = shortFeatures[1:] - shortFeatures[:-1]
+        midRatio = round((windowSize * Fs - (windowSize * Fs - windowStep * Fs)) / (windowStep * Fs))
+        features[windowStep] = mid_term_rows(list(np.hstack((shortFeatures, deltas))), midRatio, True)
+    return features
+
+#(Fs, windowSize, windowStep) configurations checked by verify_extractor in this process
+verifiedConfigs = set()
+
+#Checks that StreamingFeatureExtractor computes the same features as mid_feature_extraction, which the models are
+#trained on, for a short synthetic signal. Runs once per configuration and process.
+#Inputs:  Fs: sampling rate of the signal
+#         windowSize: size of window in seconds
+#         windowStep: step of window in seconds
+#Outputs: None, raises RuntimeError if the features differ
+def verify_extractor(Fs, windowSize, windowStep):
+    verifiedConfigs.add((Fs, windowSize, windowStep))
+    window = int(windowSize * Fs)
+    step = int(windowStep * Fs)
+    signal = np.random.RandomState(0).randint(-2 ** 14, 2 ** 14, window + 8 * step).astype(np.int16)
+    mF, sF, f_names = MidTermFeatures.mid_feature_extraction(signal, Fs, windowSize * Fs, windowStep * Fs, \
+                                                             windowSize * Fs, windowStep * Fs)
+    expected = np.transpose(np.vstack((sF, mF)))
+    extractor = StreamingFeatureExtractor(Fs, windowSize, windowStep, *signal_stats(signal, len(signal)))
+    F = np.concatenate((extractor.push(signal), extractor.finish()))
+    if F.shape != expected.shape or not np.allclose(F, expected, rtol=1e-9, atol=1e-12):
+        verifiedConfigs.discard((Fs, windowSize, windowStep))
+        raise RuntimeError("streaming features differ from mid_feature_extraction of pyAudioAnalysis %s, update " \
+                           "StreamingFeatureExtractor.short_term to match it" % metadata.version("pyAudioAnalysis"))
+
+#Opens a WAV file without reading its samples into memory
+#Inputs:  audioFilePath: path to WAV file
+#Outputs: Fs: sampling rate
+#         signal: memory-mapped mono signal (multi channel files are averaged block by block in read_block)
+def open_signal(audioFilePath):
+    Fs, signal = wavfile.read(audioFilePath, mmap=True)
+    if signal.ndim == 2 and signal.shape[1] == 1:
+        signal = signal[:, 0]
+    return Fs, signal
+
+#Reads samples [start, end) of a memory-mapped signal as a mono float array
+def read_block(signal, start, end):
+    block = np.asarray(signal[start:end], dtype=np.double)
+    if block.ndim == 2:
+        block = block.mean(1)
+    return block
+
+#Computes the DC offset and peak amplitude pyAudioAnalysis normalizes a signal by, in two passes of blockSamples
+#samples each so that the signal never has to be held in memory
+#Outputs: dcOffset, maxAmplitude as expected by StreamingFeatureExtractor
+def signal_stats(signal, blockSamples):
+    total = 0.0
+    for start in range(0, len(signal), blockSamples):
+        total += np.sum(read_block(signal, start, start + blockSamples) / (2.0 ** 15))
+    dcOffset = total / max(len(signal), 1)
+    maxAmplitude = 0.0
+    for start in range(0, len(signal), blockSamples):
+        block = read_block(signal, start, start + blockSamples) / (2.0 ** 15) - dcOffset
+        maxAmplitude = max(maxAmplitude, np.max(np.abs(block)))
+    return dcOffset, maxAmplitude
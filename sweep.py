@@ -0,0 +1,314 @@
+import argparse
+import csv
+import json
+import os
+import time
+from argparse import RawTextHelpFormatter
+from multiprocessing import Pool
+from pyAudioAnalysis import audioBasicIO
+import compute_metrics
+import proj4
+from classifiers import CLASSIFIERS, make_classifier
+from feature_cache import FeatureCache
+from feature_store import FeatureStore
+from stream_features import multi_step_features
+
+description = r'''
+This program evaluates a grid of window sizes, window steps and classifier
+settings end to end: for every combination a model is trained on the label
+files in label_files/<site>/, the held out recordings of human_labels/ are
+classified and the condensed labels are scored against the human labels with
+compute_metrics (fragment accuracy and duration weighted accuracy and F1).
+    python3 sweep.py --audio-dir DIR --window-sizes 0.25 0.5 \
+        --window-steps 0.025 0.05 --classifiers linear logistic svc
+Classifier settings are given as backend:name=value,..., for example
+linear:alpha=1e-5,epochs=10 or svc:C=10.
+Work is shared between configurations: every audio file is decoded once and
+the feature matrices of all window configurations are computed from that one
+decoded signal and stored in the feature cache. Window steps of the same window
+size that are whole multiples of a finer step (in samples, e.g. 0.05 and 0.1
+of 0.025) are computed in a single pass at the finer step: their windows are
+every k-th window of it, so only the spectral flux and the deltas, which link a
+window to the one before it, are recomputed. All classifier settings of a
+window configuration then read the same memory-mapped matrices.
+Training and scoring of the configurations run in parallel (-j). The summary
+table is printed and written to sweep.csv and sweep.json in the output
+directory, the machine labels of every configuration to a sub-directory.
+'''
+
+#Parses a classifier setting such as "linear:alpha=1e-5,epochs=10"
+#Inputs:  spec: backend name, optionally followed by a colon and comma separated name=value settings
+#Outputs: name: key of classifiers.CLASSIFIERS
+#         params: dictionary of settings, numbers are converted to int or float
+def parse_classifier(spec):
+    name, separator, settings = spec.partition(":")
+    params = {}
+    for setting in filter(None, settings.split(",")):
+        key, separator, value = setting.partition("=")
+        for convert in (int, float, str):
+            try:
+                params[key] = convert(value)
+                break
+            except ValueError:
+                continue
+    return name, params
+
+#Name of the directory the machine labels of one configuration are written to, e.g. w0.25_s0.025_linear_alpha1e-05
+def config_name(windowSize, windowStep, classifierSpec):
+    name, params = parse_classifier(classifierSpec)
+    return "_".join(["w%g" % windowSize, "s%g" % windowStep, name] + \
+                    ["%s%s" % (key, value) for key, value in sorted(params.items())])
+
+#Finds the recordings of the human label files, every human label file needs an audio file to be scored
+#Inputs:  humanDir: directory with <name>_labelled.txt files
+#         audioIndex: dictionary returned by proj4.index_audio_files
+#Outputs: evalFiles: list of (humanLabelPath, audioFilePath)
+#         missing: list of human label files without an audio file
+def find_eval_files(humanDir, audioIndex):
+    evalFiles = []
+    missing = []
+    for name in sorted(os.listdir(humanDir)):
+        if not name.endswith(".txt"):
+            continue
+        audioName = name.split("_")[0].upper()
+        if audioName in audioIndex:
+            evalFiles.append((os.path.join(humanDir, name), audioIndex[audioName]))
+        else:
+            missing.append(os.path.join(humanDir, name))
+    return evalFiles, missing
+
+#Groups the window steps of one window size that can be computed in one pass by multi_step_features
+#Inputs:  windowSteps: window steps in seconds
+#         Fs: sampling rate
+#Outputs: groups: list of lists of window steps, the first step of each group is the finest and the sample count of
+#         every other step is a multiple of it
+def step_groups(windowSteps, Fs):
+    groups = []
+    for windowStep in sorted(windowSteps, key=lambda windowStep: int(windowStep * Fs)):
+        for group in groups:
+            if int(windowStep * Fs) % int(group[0] * Fs) == 0:
+                group.append(windowStep)
+                break
+        else:
+            groups.append([windowStep])
+    return groups
+
+#Decodes an audio file once and stores the feature matrix of every window configuration that is not cached yet. Steps
+#of the same window size that are multiples of a finer one are derived from its pass (see multi_step_features).
+#Inputs:  job: (audioFilePath, windowConfigs), windowConfigs being a list of (windowSize, windowStep)
+#Outputs: stats: dictionary with the file, the seconds spent decoding and extracting, the number of extraction
+#         passes, the number of feature matrices derived from the pass of a finer step and the number found in the cache
+def extract_job(job):
+    audioFilePath, windowConfigs = job
+    stats = {"file": audioFilePath, "decodeSeconds": 0.0, "extractSeconds": 0.0, "extracted": 0, "derived": 0, \
+             "cached": 0}
+    keys = {}
+    for windowSize, windowStep in windowConfigs:
+        key = proj4.featureCache.key(audioFilePath, proj4.feature_config(windowSize, windowStep))
+        if os.path.exists(proj4.featureCache.path(key)):
+            stats["cached"] += 1
+        else:
+            keys[(windowSize, windowStep)] = key
+    if not keys:
+        return stats
+
+    start = time.perf_counter()
+    [Fs, signal] = audioBasicIO.read_audio_file(audioFilePath)
+    stats["decodeSeconds"] = time.perf_counter() - start
+    for windowSize in sorted(set(windowSize for windowSize, windowStep in keys)):
+        windowSteps = [windowStep for size, windowStep in keys if size == windowSize]
+        for group in step_groups(windowSteps, Fs):
+            start = time.perf_counter()
+            #multi_step_features needs a mono signal, multi channel files are extracted as before
+            if len(group) > 1 and signal.ndim == 1:
+                features = multi_step_features(signal, Fs, windowSize, group)
+                stats["extracted"] += 1
+                stats["derived"] += len(group) - 1
+            else:
+                features = {windowStep: proj4.signal_features(signal, Fs, windowSize, windowStep) \
+                            for windowStep in group}
+                stats["extracted"] += len(group)
+            for windowStep in group:
+                proj4.featureCache.store(keys[(windowSize, windowStep)], features[windowStep])
+            stats["extractSeconds"] += time.perf_counter() - start
+    return stats
+
+#Trains, classifies and scores one configuration. Feature matrices are read from the feature cache filled by
+#extract_job, so no audio is decoded here.
+#Inputs:  job: (windowSize, windowStep, classifierSpec, trainFiles, classOrder, evalFiles, outputDir), trainFiles
+#         being a list of (audioLabels, audioFilePath) and classOrder the class names in label file order
+#Outputs: row: dictionary with the configuration, its timings and its scores
+def sweep_job(job):
+    windowSize, windowStep, classifierSpec, trainFiles, classOrder, evalFiles, outputDir = job
+    name, params = parse_classifier(classifierSpec)
+    row = {"windowSize": windowSize, "windowStep": windowStep, "classifier": classifierSpec}
+
+    start = time.perf_counter()
+    store = FeatureStore()
+    for soundType in classOrder:
+        store.add_class(soundType)
+    for audioLabels, audioFilePath in trainFiles:
+        classRows, audioSeconds = proj4.label_features(audioLabels, audioFilePath, windowSize, windowStep)
+        for soundType, rows in classRows:
+            store.append(soundType, rows)
+    matrix, classLabels = store.training_matrix()
+    row["trainWindows"] = len(matrix)
+    row["loadSeconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    classifier = make_classifier(name, **params).fit(matrix, classLabels)
+    row["fitSeconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    proj4.classNames = store.classNames
+    labelDir = os.path.join(outputDir, config_name(windowSize, windowStep, classifierSpec))
+    os.makedirs(labelDir, exist_ok=True)
+    pairs = []
+    evalWindows = 0
+    for humanLabelPath, audioFilePath in evalFiles:
+        F, audioSeconds = proj4.audio_features(audioFilePath, windowSize, windowStep)
+        machineLabelPath = os.path.join(labelDir, os.path.basename(humanLabelPath))
+        proj4.condense_prediction(classifier.predict(F), machineLabelPath, windowSize, windowStep)
+        pairs.append((humanLabelPath, machineLabelPath))
+        evalWindows += len(F)
+    row["evalWindows"] = evalWindows
+    row["classifySeconds"] = time.perf_counter() - start
+
+    fragments = compute_metrics.evaluate_pairs(pairs)
+    durations = compute_metrics.evaluate_durations_pairs(pairs)
+    f1s = [stats["f1"] for stats in durations["classes"].values() if stats["human_ms"] > 0 and stats["f1"] is not None]
+    row.update({"accuracy": fragments["accuracy"], "birdAccuracy": fragments["bird_or_no_bird"]["accuracy"], \
+                "durationAccuracy": durations["accuracy"], \
+                "durationBirdAccuracy": durations["bird_or_no_bird"]["accuracy"], \
+                "macroF1": sum(f1s) / len(f1s) if f1s else None, "labelDir": labelDir})
+    return row
+
+#Runs the sweep
+#Inputs:  trainPairs: list of (labelFilePath, audioFilePath) to train on
+#         evalFiles: list of (humanLabelPath, audioFilePath) to score
+#         windowConfigs: list of (windowSize, windowStep)
+#         classifierSpecs: list of classifier settings, see parse_classifier
+#         outputDir: directory the machine labels are written to
+#         workers: number of worker processes
+#Outputs: rows: one result dictionary per configuration, in grid order
+#         extractStats: list of per audio file statistics returned by extract_job
+def run_sweep(trainPairs, evalFiles, windowConfigs, classifierSpecs, outputDir, workers):
+    for labelFilePath, audioFilePath in trainPairs:
+        proj4.process_label(labelFilePath)
+    trainFiles = [(proj4.labels[os.path.basename(labelFilePath).split("_")[0]], audioFilePath) \
+                  for labelFilePath, audioFilePath in trainPairs]
+    classOrder = proj4.features.keys()
+    audioFiles = sorted(set(audioFilePath for labelFilePath, audioFilePath in trainPairs + evalFiles))
+
+    extractJobs = [(audioFilePath, windowConfigs) for audioFilePath in audioFiles]
+    jobs = [(windowSize, windowStep, classifierSpec, trainFiles, classOrder, evalFiles, outputDir) \
+            for windowSize, windowStep in windowConfigs for classifierSpec in classifierSpecs]
+    if workers > 1:
+        with Pool(processes=workers, initializer=proj4.init_worker, initargs=([], None, proj4.featureCache)) as pool:
+            extractStats = list(pool.imap_unordered(extract_job, extractJobs))
+            rows = list(pool.imap(sweep_job, jobs))
+    else:
+        extractStats = [extract_job(job) for job in extractJobs]
+        rows = [sweep_job(job) for job in jobs]
+    return rows, extractStats
+
+#Summary table columns: (key, heading, format)
+COLUMNS = [("windowSize", "size", "%g"), ("windowStep", "step", "%g"), ("classifier", "classifier", "%s"), \
+           ("trainWindows", "train win", "%d"), ("fitSeconds", "fit s", "%.2f"), \
+           ("classifySeconds", "classify s", "%.2f"), ("accuracy", "frag acc", "%.4f"), \
+           ("birdAccuracy", "bird acc", "%.4f"), ("durationAccuracy", "dur acc", "%.4f"), \
+           ("durationBirdAccuracy", "dur bird", "%.4f"), ("macroF1", "macro F1", "%.4f")]
+
+#Prints the results as a table, the best configuration by duration weighted accuracy is marked with *
+def print_results(rows):
+    width = max([len("classifier")] + [len(row["classifier"]) for row in rows])
+    widths = [width if key == "classifier" else max(len(heading), 7) for key, heading, fmt in COLUMNS]
+    print("  " + " ".join(heading.rjust(w) for (key, heading, fmt), w in zip(COLUMNS, widths)))
+    scored = [row for row in rows if row["durationAccuracy"] is not None]
+    best = max(scored, key=lambda row: row["durationAccuracy"]) if scored else None
+    for row in rows:
+        cells = [(fmt % row[key]) if row[key] is not None else "-" for key, heading, fmt in COLUMNS]
+        print(("* " if row is best else "  ") + " ".join(cell.rjust(w) for cell, w in zip(cells, widths)))
+
+#Writes the results to sweep.csv and sweep.json in outputDir
+def write_results(rows, extractStats, outputDir):
+    keys = [key for key, heading, fmt in COLUMNS] + ["evalWindows", "loadSeconds", "labelDir"]
+    with open(os.path.join(outputDir, "sweep.csv"), 'w', newline='') as csvFile:
+        writer = csv.writer(csvFile)
+        writer.writerow(keys)
+        for row in rows:
+            writer.writerow([row[key] for key in keys])
+    with open(os.path.join(outputDir, "sweep.json"), 'w') as jsonFile:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": rows, "extraction": extractStats}, \
+                  jsonFile, indent=2)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=description, formatter_class=RawTextHelpFormatter)
+    parser.add_argument('--audio-dir', required=True, \
+                        help="Directory searched recursively for the audio files of the label files")
+    parser.add_argument('--label-dir', default="label_files", \
+                        help="Directory with one sub-directory of training label files per site\n" + \
+                             "(default: label_files)")
+    parser.add_argument('--sites', nargs='+', \
+                        help="Sites to train on (default: every sub-directory of the label directory)")
+    parser.add_argument('--human-labels', default="human_labels", \
+                        help="Directory with the human labels the configurations are scored against\n" + \
+                             "(default: human_labels)")
+    parser.add_argument('--train-on-eval', action='store_true', \
+                        help="Also train on the recordings of the human label directory, which are held out\n" + \
+                             "by default")
+    parser.add_argument('--window-sizes', type=float, nargs='+', default=[0.25], \
+                        help="Window sizes in seconds (default: 0.25)")
+    parser.add_argument('--window-steps', type=float, nargs='+', default=[0.025], \
+                        help="Window steps in seconds (default: 0.025)")
+    parser.add_argument('--classifiers', nargs='+', default=["linear"], \
+                        help="Classifier settings, backend[:name=value,...] with backend one of\n" + \
+                             ", ".join(sorted(CLASSIFIERS)) + " (default: linear)")
+    parser.add_argument('-o', '--output-dir', default="sweep_results", \
+                        help="Directory for the machine labels and summary files (default: sweep_results)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), \
+                        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument('--cache-dir', default=os.environ.get("PROJ4_FEATURE_CACHE"), \
+                        help="Directory of the feature cache (default: $PROJ4_FEATURE_CACHE or\n" + \
+                             "OUTPUT_DIR/feature_cache)")
+    parser.add_argument('--cache-size', type=float, default=float(os.environ.get("PROJ4_FEATURE_CACHE_MB", 4096)), \
+                        help="Size bound of the feature cache in MB, should hold the matrices of every file\n" + \
+                             "and window configuration (default: $PROJ4_FEATURE_CACHE_MB or 4096)")
+    args = parser.parse_args()
+
+    for classifierSpec in args.classifiers:
+        if parse_classifier(classifierSpec)[0] not in CLASSIFIERS:
+            parser.error("unknown classifier backend in " + classifierSpec)
+    audioIndex = proj4.index_audio_files(args.audio_dir)
+    evalFiles, missing = find_eval_files(args.human_labels, audioIndex)
+    for labelFilePath in missing:
+        print("Warning: no audio file found for " + labelFilePath)
+    if not evalFiles:
+        parser.error("no audio files found for the human labels in " + args.human_labels)
+    trainPairs, missing = proj4.find_training_pairs(args.label_dir, args.audio_dir, args.sites)
+    if not args.train_on_eval:
+        evalAudio = set(audioFilePath for humanLabelPath, audioFilePath in evalFiles)
+        trainPairs = [pair for pair in trainPairs if pair[1] not in evalAudio]
+    if not trainPairs:
+        parser.error("no labelled audio files left to train on")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    proj4.featureCache = FeatureCache(args.cache_dir or os.path.join(args.output_dir, "feature_cache"), \
+                                      int(args.cache_size * 2**20))
+    windowConfigs = [(windowSize, windowStep) for windowSize in args.window_sizes for windowStep in args.window_steps]
+
+    start = time.perf_counter()
+    rows, extractStats = run_sweep(trainPairs, evalFiles, windowConfigs, args.classifiers, args.output_dir, \
+                                   args.workers)
+    wallTime = time.perf_counter() - start
+
+    print_results(rows)
+    write_results(rows, extractStats, args.output_dir)
+    print("")
+    print("%d configurations on %d training and %d scored files in %.1f s wall time" % \
+          (len(rows), len(trainPairs), len(evalFiles), wallTime))
+    print("    %d files decoded once for %d window configurations: %d extraction passes, %d feature matrices " \
+          "derived from a finer step, %d cached" % \
+          (len(extractStats), len(windowConfigs), sum(stats["extracted"] for stats in extractStats), \
+           sum(stats["derived"] for stats in extractStats), sum(stats["cached"] for stats in extractStats)))
+    print("Results written to " + os.path.join(args.output_dir, "sweep.csv") + " and sweep.json")